@@ -1,5 +1,6 @@
 """应用配置模块，使用 Pydantic Settings 管理环境变量。"""
 
+import os
 from pathlib import Path
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -37,6 +38,40 @@ class Settings(BaseSettings):
     # 图片质量（1-95）
     image_quality: int = 75
 
+    # 图片编码格式：jpeg（渐进式）/ webp / avif（Pillow 不支持时回退为 jpeg）
+    image_format: str = "jpeg"
+
+    # 单张主图目标体积（KB）：超出时逐帧二分查找满足目标的最高质量（不高于 image_quality，0 表示固定质量）
+    image_target_kb: int = 0
+
+    # 关键帧提取模式：parallel（分区间并行解码）/ single_pass（单次解码输出全部帧）/ per_frame（逐帧 seek）
+    frame_extract_mode: str = "parallel"
+
+    # 关键帧吸附容差（毫秒）：时间点前后该范围内有关键帧时直接取关键帧，不解码中间帧（0 表示精确取帧）
+    frame_snap_ms: int = 0
+
+    # 帧缓存上限（MB）：按影片 + 时间戳 + 输出尺寸缓存提取的帧，重新处理同一影片时复用（0 表示关闭；开启后每帧多一次 JPEG 编码与写盘）
+    frame_cache_mb: int = 0
+
+    # 场景检测阈值（0-1）：无字幕且转录失败时按画面切换分段（0 表示关闭，改为每 30 秒一段）
+    scene_threshold: float = 0.3
+
+    # 调试：保留提取的帧到 frames/ 目录（默认帧只在内存中流转，不落盘）
+    keep_frames: bool = False
+
+    # 帧提取 CPU 预算：进程内同时运行的 FFmpeg 数上限（0 表示 CPU 核数）
+    extract_cpu_budget: int = 0
+
+    # 帧去重阈值：感知哈希汉明距离不超过该值、且逐格灰度差异极小的帧共用一张图片（-1 关闭）
+    frame_dedupe_distance: int = 24
+
+    # 投影片输出格式：multi（HTML 外壳 + slides.json + images/，查看器分页按需加载）/ single（自包含单文件 HTML）
+    # / packed（自包含单文件，图片打包为一个数据块，查看时按需解码）
+    deck_format: str = "multi"
+
+    # 图片编码进程数（所有任务共享，0 表示 CPU 核数）
+    encode_workers: int = 0
+
     # 最大并发任务数
     max_concurrent_jobs: int = 2
 
@@ -53,6 +88,21 @@ class Settings(BaseSettings):
     # Whisper 语音转录配置（无字幕时使用）
     whisper_model: str = "small"  # tiny / base / small / medium / large
 
+    # 常驻 Whisper 模型参数总大小上限（MB）：超出时淘汰最久未用且空闲的模型（0 表示不限）
+    whisper_cache_mb: int = 4096
+
+    # 分块并行转录：音频在静音处切成约该秒数的块，由多个进程并行转录（0 表示在本进程中按 5 分钟窗口依次转录）
+    whisper_chunk_seconds: int = 0
+
+    # 分块转录的工作进程数（每个进程各加载一份模型，torch 线程数按 CPU 核数均分）
+    whisper_workers: int = 2
+
+    # 转录前做语音活动检测（能量 + 过零率），只把语音区间交给 Whisper，跳过片头音乐、长静音等
+    whisper_vad: bool = True
+
+    # 启动时在后台预加载 WHISPER_MODEL，首个无字幕任务无需等待模型加载
+    whisper_warmup: bool = False
+
     @property
     def data_path(self) -> Path:
         """返回数据根目录的 Path 对象。"""
@@ -68,6 +118,21 @@ class Settings(BaseSettings):
         """返回任务数据目录路径。"""
         return self.data_path / "jobs"
 
+    @property
+    def frame_cache_path(self) -> Path:
+        """返回跨任务帧缓存目录路径。"""
+        return self.data_path / "frame_cache"
+
+    @property
+    def extract_worker_count(self) -> int:
+        """返回帧提取可用的 FFmpeg 进程数。"""
+        return max(1, self.extract_cpu_budget or os.cpu_count() or 1)
+
+    @property
+    def encode_worker_count(self) -> int:
+        """返回图片编码进程数。"""
+        return max(1, self.encode_workers or os.cpu_count() or 1)
+
     @property
     def subtitle_langs_list(self) -> list[str]:
         """将字幕语言字符串解析为列表。"""
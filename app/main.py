@@ -1,5 +1,6 @@
 """FastAPI 应用入口，注册路由、静态文件服务、生命周期管理。"""
 
+import asyncio
 from contextlib import asynccontextmanager
 from pathlib import Path
 
@@ -12,6 +13,8 @@ from loguru import logger
 from app.config import settings
 from app.database import init_db
 from app.routers import video, sse
+from app.services.optimizer import shutdown_encode_pool
+from app.services.transcriber import shutdown_whisper_pool
 
 
 @asynccontextmanager
@@ -26,11 +29,20 @@ async def lifespan(app: FastAPI):
     # 初始化数据库
     init_db()
     logger.info(f"数据库初始化完成: {settings.db_path}")
+
+    # Whisper 模型预热：后台加载，不阻塞服务启动
+    if settings.whisper_warmup:
+        from app.services.transcriber import whisper_models
+
+        asyncio.get_event_loop().run_in_executor(None, whisper_models.preload, settings.whisper_model)
+        logger.info(f"后台预加载 Whisper 模型: {settings.whisper_model}")
     logger.info(f"服务启动成功，访问 http://{settings.app_host}:{settings.app_port}")
 
     yield
 
     logger.info("服务关闭中...")
+    shutdown_encode_pool()
+    shutdown_whisper_pool()
 
 
 app = FastAPI(
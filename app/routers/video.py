@@ -1,12 +1,14 @@
 """影片处理 API 路由：创建任务、查询任务、下载结果。"""
 
 import asyncio
+import re
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, RedirectResponse, Response
 from sqlmodel import Session, select
 
 from app.config import settings
@@ -14,6 +16,7 @@ from app.database import get_session
 from app.models.job import Job, JobStatus
 from app.schemas.job import JobCreate, JobResponse
 from app.services.pipeline import Pipeline
+from app.services.slide_builder import SlideBuilder
 
 router = APIRouter(prefix="/api/jobs", tags=["jobs"])
 
@@ -31,6 +34,25 @@ _ACTIVE_STATUSES = {
     JobStatus.BUILDING_SLIDES,
 }
 
+# 多文件投影片的图片文件名（防止路径穿越）
+_DECK_IMAGE_RE = re.compile(r"^[\w-]+\.(jpg|jpeg|webp|avif|png)$")
+
+# 图片扩展名 → MIME 类型（部分 Python 版本的 mimetypes 不认识 avif/webp）
+_DECK_IMAGE_MIME = {
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "avif": "image/avif",
+    "png": "image/png",
+}
+
+# 图片文件名带内容哈希（内容变化即换地址），可长期缓存；外壳与清单每次校验
+_IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+_REVALIDATE_CACHE = "no-cache"
+
+# 单文件打包互斥，避免并发下载重复打包同一任务
+_bundle_lock = asyncio.Lock()
+
 
 @router.post("", response_model=JobResponse, status_code=201)
 async def create_job(
@@ -133,8 +155,8 @@ async def delete_job(
 async def view_slides(
     job_id: int,
     session: Session = Depends(get_session),
-) -> FileResponse:
-    """在浏览器中内联展示 HTML 投影片（不触发下载）。"""
+) -> Response:
+    """在浏览器中内联展示 HTML 投影片（不触发下载）；多文件投影片跳转到外壳页。"""
     job = session.get(Job, job_id)
     if not job:
         raise HTTPException(status_code=404, detail=f"任务 {job_id} 不存在")
@@ -145,6 +167,9 @@ async def view_slides(
     if not output_path.exists():
         raise HTTPException(status_code=404, detail="投影片文件不存在")
 
+    if output_path.name == SlideBuilder.DECK_SHELL:
+        return RedirectResponse(f"/api/jobs/{job_id}/deck/")
+
     # 不传 filename，浏览器收到 Content-Disposition: inline，直接渲染而非下载
     return FileResponse(path=str(output_path), media_type="text/html")
 
@@ -154,7 +179,7 @@ async def download_slides(
     job_id: int,
     session: Session = Depends(get_session),
 ) -> FileResponse:
-    """下载已生成的 HTML 投影片文件（触发另存为）。"""
+    """下载已生成的 HTML 投影片文件（触发另存为）；多文件投影片按需打包为自包含单文件。"""
     job = session.get(Job, job_id)
     if not job:
         raise HTTPException(status_code=404, detail=f"任务 {job_id} 不存在")
@@ -165,6 +190,9 @@ async def download_slides(
     if not output_path.exists():
         raise HTTPException(status_code=404, detail="投影片文件不存在")
 
+    if output_path.name == SlideBuilder.DECK_SHELL:
+        output_path = await _bundle_deck(output_path.parent)
+
     safe_title = "".join(c for c in (job.title or "slides") if c.isalnum() or c in " -_")[:50]
     return FileResponse(
         path=str(output_path),
@@ -173,6 +201,116 @@ async def download_slides(
     )
 
 
+@router.get("/{job_id}/deck/")
+async def deck_shell(
+    job_id: int,
+    session: Session = Depends(get_session),
+) -> FileResponse:
+    """多文件投影片的 HTML 外壳。"""
+    deck_dir = _deck_dir(session, job_id)
+    return FileResponse(
+        path=str(deck_dir / SlideBuilder.DECK_SHELL),
+        media_type="text/html",
+        headers={"Cache-Control": _REVALIDATE_CACHE},
+    )
+
+
+@router.get("/{job_id}/deck/slides.json")
+async def deck_manifest(
+    job_id: int,
+    session: Session = Depends(get_session),
+) -> FileResponse:
+    """多文件投影片的清单（字幕、时间轴与图片文件名）。"""
+    deck_dir = _deck_dir(session, job_id)
+    return FileResponse(
+        path=str(deck_dir / SlideBuilder.DECK_MANIFEST),
+        media_type="application/json",
+        headers={"Cache-Control": _REVALIDATE_CACHE},
+    )
+
+
+@router.get("/{job_id}/deck/search.json")
+async def deck_search_index(
+    job_id: int,
+    session: Session = Depends(get_session),
+) -> FileResponse:
+    """多文件投影片的搜索倒排索引（查看器首次搜索时加载）。"""
+    deck_dir = _deck_dir(session, job_id)
+    return FileResponse(
+        path=str(deck_dir / SlideBuilder.DECK_SEARCH),
+        media_type="application/json",
+        headers={"Cache-Control": _REVALIDATE_CACHE},
+    )
+
+
+@router.get("/{job_id}/slides")
+async def list_slides(
+    job_id: int,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(SlideBuilder.PAGE_SIZE, ge=1, le=500),
+    session: Session = Depends(get_session),
+) -> dict:
+    """
+    分页返回投影片数据（字幕、时间轴与图片地址），供查看器按需加载。
+
+    仅多文件投影片支持；图片地址指向 /deck/images/ 下的文件。
+    """
+    deck_dir = _deck_dir(session, job_id)
+    page = await run_in_threadpool(SlideBuilder(deck_dir).read_slides, offset, limit)
+    base = f"/api/jobs/{job_id}/deck/"
+    page["slides"] = [
+        {
+            **slide,
+            "image": base + slide["image"] if slide.get("image") else None,
+            "thumb": base + slide["thumb"] if slide.get("thumb") else None,
+        }
+        for slide in page["slides"]
+    ]
+    return page
+
+
+@router.get("/{job_id}/deck/images/{name}")
+async def deck_image(
+    job_id: int,
+    name: str,
+    session: Session = Depends(get_session),
+) -> FileResponse:
+    """多文件投影片的单张图片，浏览器按需拉取并长期缓存。"""
+    match = _DECK_IMAGE_RE.match(name)
+    if not match:
+        raise HTTPException(status_code=400, detail="无效的图片文件名")
+    image_path = _deck_dir(session, job_id) / SlideBuilder.DECK_IMAGES / name
+    if not image_path.exists():
+        raise HTTPException(status_code=404, detail="图片不存在")
+    return FileResponse(
+        path=str(image_path),
+        media_type=_DECK_IMAGE_MIME[match.group(1)],
+        headers={"Cache-Control": _IMMUTABLE_CACHE},
+    )
+
+
+def _deck_dir(session: Session, job_id: int) -> Path:
+    """返回已完成的多文件投影片目录，不存在时抛出 HTTP 异常。"""
+    job = session.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"任务 {job_id} 不存在")
+    if job.status != JobStatus.COMPLETED or not job.output_path:
+        raise HTTPException(status_code=400, detail="投影片尚未生成完成")
+    output_path = Path(job.output_path)
+    if output_path.name != SlideBuilder.DECK_SHELL or not output_path.exists():
+        raise HTTPException(status_code=404, detail="该任务未生成多文件投影片")
+    return output_path.parent
+
+
+async def _bundle_deck(deck_dir: Path) -> Path:
+    """将多文件投影片打包为单文件 HTML（已打包则直接复用）。"""
+    bundle_path = deck_dir / "slides.html"
+    async with _bundle_lock:
+        if not bundle_path.exists():
+            await run_in_threadpool(SlideBuilder(deck_dir).bundle_deck)
+    return bundle_path
+
+
 async def _run_pipeline(job_id: int) -> None:
     """后台任务：执行处理流水线。"""
     pipeline = Pipeline(job_id)
@@ -0,0 +1,105 @@
+"""帧去重服务：以感知哈希识别内容相同或近似的帧，使多张投影片共用一张图片。"""
+
+import threading
+from typing import Optional
+from loguru import logger
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    logger.warning("Pillow 未安装，帧去重功能不可用")
+
+
+class FrameDeduplicator:
+    """
+    基于感知哈希的帧去重器。
+
+    每帧缩为 GRID_WIDTH×GRID_HEIGHT 灰度缩略图，比较水平相邻格子得到梯度哈希
+    （差值超过 GRADIENT_MARGIN 记为 1，纯色区域不受噪点与压缩失真影响）。
+    哈希汉明距离不超过阈值的已保留帧作为候选，再逐格比较灰度：
+    最大差值不超过 MAX_CELL_DELTA 才视为重复，避免只改动一行文字的投影片被合并。
+    线程安全，可在多个提取线程中同时调用。
+    """
+
+    GRID_WIDTH = 64
+    GRID_HEIGHT = 36
+    GRADIENT_MARGIN = 4
+    MAX_CELL_DELTA = 8
+
+    def __init__(self, max_distance: int = 24):
+        """
+        初始化去重器。
+
+        参数：
+            max_distance: 候选帧的最大哈希汉明距离（哈希共约 2300 位，仅用于快速筛选候选）
+        """
+        self.max_distance = max_distance
+        self.duplicates = 0
+        self._lock = threading.Lock()
+        self._fingerprints: list[int] = []
+        self._grids: list[bytes] = []
+        self._owners: list[int] = []
+
+    def match(self, indices: list[int], image: Optional["Image.Image"]) -> Optional[int]:
+        """
+        查找与该帧重复的已保留帧。
+
+        第一张投影片需内联预渲染，包含它的帧始终保留。
+
+        参数：
+            indices: 共用该帧的投影片序号列表
+            image: 内存中的帧（None 表示提取失败，不参与去重）
+
+        返回：
+            重复时返回已保留帧的投影片序号；否则登记为新帧并返回 None
+        """
+        if image is None or not PIL_AVAILABLE:
+            return None
+        grid = image.resize((self.GRID_WIDTH, self.GRID_HEIGHT), Image.BOX).convert("L").tobytes()
+        fingerprint = self._fingerprint(grid)
+        with self._lock:
+            if 0 not in indices:
+                # 从最近保留的帧开始比较：重复帧大多出现在相邻片段
+                for i in range(len(self._fingerprints) - 1, -1, -1):
+                    if (self._fingerprints[i] ^ fingerprint).bit_count() > self.max_distance:
+                        continue
+                    if max(abs(a - b) for a, b in zip(self._grids[i], grid)) <= self.MAX_CELL_DELTA:
+                        self.duplicates += len(indices)
+                        return self._owners[i]
+            self._fingerprints.append(fingerprint)
+            self._grids.append(grid)
+            self._owners.append(min(indices))
+        return None
+
+    def forget(self, owners: set[int]) -> None:
+        """
+        撤销由指定投影片登记的帧（这些帧未能写出时调用，避免后续重复帧引用一张不存在的图片）。
+
+        参数：
+            owners: 未写出的投影片序号
+        """
+        with self._lock:
+            keep = [i for i, owner in enumerate(self._owners) if owner not in owners]
+            self._fingerprints = [self._fingerprints[i] for i in keep]
+            self._grids = [self._grids[i] for i in keep]
+            self._owners = [self._owners[i] for i in keep]
+
+    def clear(self) -> None:
+        """清空已登记的帧（片段列表作废、序号不再有效时调用）。"""
+        with self._lock:
+            self._fingerprints.clear()
+            self._grids.clear()
+            self._owners.clear()
+            self.duplicates = 0
+
+    @classmethod
+    def _fingerprint(cls, grid: bytes) -> int:
+        """由灰度缩略图计算梯度哈希（每行 GRID_WIDTH-1 位）。"""
+        bits = 0
+        for row in range(cls.GRID_HEIGHT):
+            base = row * cls.GRID_WIDTH
+            for col in range(base, base + cls.GRID_WIDTH - 1):
+                bits = (bits << 1) | (abs(grid[col] - grid[col + 1]) > cls.GRADIENT_MARGIN)
+        return bits
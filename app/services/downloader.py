@@ -60,7 +60,7 @@ class VideoDownloader:
             url: YouTube 影片 URL
 
         返回：
-            包含 title, duration, thumbnail, subtitles 等字段的字典
+            包含 id, title, duration, thumbnail, subtitles 等字段的字典
         """
         opts = {**self._base_opts(), "skip_download": True}
 
@@ -72,6 +72,7 @@ class VideoDownloader:
         info = await loop.run_in_executor(None, _extract)
 
         return {
+            "id": info.get("id", ""),
             "title": info.get("title", "未知标题"),
             "duration": info.get("duration", 0),
             "thumbnail": info.get("thumbnail", ""),
@@ -1,129 +1,671 @@
 """关键帧提取服务：根据字幕时间戳使用 FFmpeg 截取影片帧。"""
 
 import asyncio
+import bisect
+import functools
+import io
+import os
+import queue
+import re
 import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Callable
+from typing import TYPE_CHECKING, Optional, Callable
 from loguru import logger
 
+from app.config import settings
+from app.services.frame_cache import FrameCache
+from app.services.frame_store import PackedFrameStore
+from app.services.probe import VideoProbe
 from app.services.subtitle import SubtitleSegment
 
+if TYPE_CHECKING:
+    from PIL import Image
+
+# showinfo 滤镜输出的帧信息行，如 "n:   3 pts: 123456 pts_time:12.345"
+_SHOWINFO_RE = re.compile(r"\bn:\s*(\d+)\s+pts:\s*-?\d+\s+pts_time:(-?[\d.]+)")
+
+# 进程内共享的 FFmpeg 线程池，所有任务共用，总并发受 CPU 预算限制
+_executor: Optional[ThreadPoolExecutor] = None
+
+# 内存帧回调：(对应的片段序号列表, RGB 图片；提取失败时为 None)
+ImageCallback = Callable[[list[int], Optional["Image.Image"]], None]
+
+
+def _extract_executor() -> ThreadPoolExecutor:
+    """返回（必要时创建）帧提取共用的线程池。"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.extract_worker_count,
+            thread_name_prefix="frame-extract",
+        )
+    return _executor
+
 
 class KeyframeExtractor:
     """使用 FFmpeg 从影片中提取字幕对应的关键帧。"""
 
+    # 单次解码模式下帧时间与目标时间允许的最大偏差（以帧间隔计）
+    SINGLE_PASS_TOLERANCE = 1.5
+
+    # FFmpeg 缩放算法：区域平均，速度接近 fast_bilinear，且 4K 等大倍率缩小时不产生锯齿
+    SCALE_FLAGS = "area"
+
     def __init__(
         self,
         video_path: Path,
-        frames_dir: Path,
         ffmpeg_path: str = "ffmpeg",
+        ffprobe_path: str = "ffprobe",
+        mode: str = "parallel",
+        workers: Optional[int] = None,
+        snap_tolerance: float = 0.0,
+        frame_cache: Optional[FrameCache] = None,
+        frame_store: Optional[PackedFrameStore] = None,
     ):
         """
         初始化关键帧提取器。
 
         参数：
             video_path: 影片文件路径
-            frames_dir: 输出帧目录
             ffmpeg_path: FFmpeg 可执行文件路径
+            ffprobe_path: ffprobe 可执行文件路径
+            mode: 提取模式（parallel 分区间并行解码 / single_pass 单次解码 / per_frame 逐帧 seek）
+            workers: 并行模式的区间数，默认取 CPU 预算
+            snap_tolerance: 关键帧吸附容差（秒）：容差内有关键帧的时间点改取该关键帧，
+                只解码关键帧本身；0 表示精确取帧
+            frame_cache: 跨任务帧缓存（按时间戳与输出尺寸命中，None 表示不缓存）
+            frame_store: 另存帧的打包存储（调试用，键为片段序号；None 表示不保存）
         """
         self.video_path = video_path
-        self.frames_dir = frames_dir
         self.ffmpeg_path = ffmpeg_path
-        self.frames_dir.mkdir(parents=True, exist_ok=True)
+        self.ffprobe_path = ffprobe_path
+        self.mode = mode
+        self.workers = max(1, workers or settings.extract_worker_count)
+        self.snap_tolerance = snap_tolerance
+        self.probe = VideoProbe(video_path, ffprobe_path)
+        self.frame_cache = frame_cache
+        self.frame_store = frame_store
 
-    async def extract(
+    async def extract_images(
         self,
         segments: list[SubtitleSegment],
+        on_image: ImageCallback,
         progress_callback: Optional[Callable[[int], None]] = None,
-    ) -> list[Path]:
+        max_size: tuple[int, int] = (1280, 720),
+        prefetched: Optional[PackedFrameStore] = None,
+        skip: Optional[set[int]] = None,
+        first_index: int = 0,
+    ) -> None:
         """
-        批量提取关键帧，每个字幕片段截取片段中间时间点的帧。
+        提取关键帧：FFmpeg 直接输出缩放后的 RGB 原始帧，不写中间 JPEG。
+
+        每得到一帧即在工作线程中调用 on_image（多个片段可能共用同一帧）；
+        除 skip 中的片段外，所有片段都会被回调恰好一次，提取失败的片段图片为 None。
+        设置了帧缓存时先交付命中缓存的帧，只提取其余时间点，新提取的帧写入缓存。
+        设置了 frame_store 时（调试用），同时将帧以片段序号为键写入打包存储。
 
         参数：
             segments: 字幕片段列表
+            on_image: 帧回调，接收 (片段序号列表, PIL RGB 图片)
             progress_callback: 进度回调，接受 0-100 整数
-
-        返回：
-            已提取的帧文件路径列表（与 segments 一一对应）
+            max_size: 输出帧最大尺寸（宽, 高），等比缩放
+            prefetched: 已截取的帧（以片段序号为键，如场景检测时顺带截取的帧），优先交付
+            skip: 已在别处处理完毕的片段序号（如转录期间已提前提取），不再提取也不回调
+            first_index: segments 在完整片段列表中的起始序号；prefetched 与 skip 按 segments 内的序号，
+                交给 on_image 与 frame_store 的序号加上该偏移
         """
-        frame_paths: list[Path] = []
         total = len(segments)
+        if total == 0:
+            return
+        if skip and len(skip) >= total:
+            if progress_callback:
+                progress_callback(100)
+            return
+
+        loop = asyncio.get_event_loop()
+        size = await loop.run_in_executor(_extract_executor(), self._fit_size, max_size)
+        timestamps = [self._midpoint(seg) for seg in segments]
+
+        lock = threading.Lock()
+        delivered: set[int] = set(skip or ())
+        report = self._progress_reporter(total, progress_callback)
+
+        # 吸附后的实际取帧时间，作为缓存键
+        snapped: dict[float, list[int]] = {}
+        if self.snap_tolerance > 0:
+            snapped = await loop.run_in_executor(
+                _extract_executor(), self._snap_targets, list(enumerate(timestamps))
+            )
+        effective = list(timestamps)
+        for keyframe, indices in snapped.items():
+            for idx in indices:
+                effective[idx] = keyframe
 
-        for idx, seg in enumerate(segments):
-            # 取片段时间中间点截帧，与字幕显示内容最贴合
-            timestamp = (seg.start + seg.end) / 2.0
-            frame_path = self.frames_dir / f"frame_{idx:05d}.jpg"
+        def _deliver(indices: list[int], image, cached: bool = False) -> None:
+            # 并行区间可能在不同线程回调，按序号去重，保证每个片段只交付一次
+            with lock:
+                fresh = [i for i in indices if i not in delivered]
+                delivered.update(fresh)
+                count = len(delivered)
+            if not fresh:
+                return
+            if image is not None and self.frame_cache and not cached:
+                self.frame_cache.store([effective[i] for i in fresh], size, image)
+            if first_index:
+                fresh = [first_index + i for i in fresh]
+            if image is not None and self.frame_store is not None:
+                buf = io.BytesIO()
+                image.save(buf, format="JPEG", quality=95)
+                self.frame_store.put(fresh, buf.getvalue())
+            on_image(fresh, image)
+            report(count)
 
-            if not frame_path.exists():
-                await self._extract_frame(timestamp, frame_path)
+        if prefetched is not None:
+            def _restore_prefetched(idx: int) -> None:
+                data = prefetched.get(idx)
+                if data:
+                    _deliver([idx], self._decode_jpeg(data), cached=True)
 
-            frame_paths.append(frame_path)
+            await asyncio.gather(*[
+                loop.run_in_executor(_extract_executor(), _restore_prefetched, idx)
+                for idx in prefetched.keys()
+                if idx < total
+            ])
 
-            if progress_callback and total > 0:
-                progress_callback(int((idx + 1) / total * 100))
+        if self.frame_cache:
+            hits = await loop.run_in_executor(_extract_executor(), self.frame_cache.lookup, effective, size)
 
-        logger.info(f"关键帧提取完成: {len(frame_paths)} 帧")
-        return frame_paths
+            def _restore(key: int, indices: list[int]) -> None:
+                image = self.frame_cache.load(key, size)
+                if image is not None:
+                    _deliver(indices, image, cached=True)
 
-    async def _extract_frame(self, timestamp: float, output_path: Path) -> None:
+            await asyncio.gather(*[
+                loop.run_in_executor(_extract_executor(), _restore, key, indices)
+                for key, indices in hits.items()
+            ])
+            if hits:
+                logger.info(f"帧缓存命中: {len(delivered)}/{total} 段")
+
+        if snapped:
+            def _snap(keyframe: float, indices: list[int]) -> None:
+                # 已由缓存交付的跳过；失败时不交付，留给下面的精确提取
+                if all(idx in delivered for idx in indices):
+                    return
+                image = self._grab_frame(keyframe, size, keyframe=True)
+                if image is not None:
+                    _deliver(indices, image)
+
+            await asyncio.gather(*[
+                loop.run_in_executor(_extract_executor(), _snap, kf, indices)
+                for kf, indices in snapped.items()
+            ])
+
+        remaining = [idx for idx in range(total) if idx not in delivered]
+        if self.mode in ("single_pass", "parallel") and len(remaining) > 1:
+            try:
+                await self._extract_select(
+                    [(idx, timestamps[idx]) for idx in remaining],
+                    functools.partial(self._run_select_raw, size=size, on_image=_deliver),
+                )
+            except Exception as e:
+                logger.warning(f"内存解码提取失败，回退为逐帧提取: {e}")
+
+        pending = [idx for idx in range(total) if idx not in delivered]
+        if pending and len(pending) < len(remaining):
+            logger.warning(f"单次解码遗漏 {len(pending)} 帧，逐帧补提取")
+
+        def _fallback(idx: int) -> None:
+            _deliver([idx], self._grab_frame(timestamps[idx], size))
+
+        await asyncio.gather(*[
+            loop.run_in_executor(_extract_executor(), _fallback, idx) for idx in pending
+        ])
+        logger.info(f"关键帧内存提取完成: {total} 帧 ({size[0]}x{size[1]})")
+
+    def detect_scenes(
+        self,
+        threshold: float,
+        store: PackedFrameStore,
+        max_size: tuple[int, int] = (1280, 720),
+        min_interval: float = 2.0,
+        duration: float = 0.0,
+        progress_callback: Optional[Callable[[int], None]] = None,
+    ) -> list[float]:
         """
-        异步调用 FFmpeg 提取指定时间戳的帧。
+        单次解码检测场景切换，并在同一次解码中截取每个场景的第一帧（同步，在线程池中运行）。
+
+        帧先缩小到输出尺寸再计算场景变化分数，select 只放行第一帧与分数超过阈值的帧；
+        距上一个场景不足 min_interval 秒的切换忽略，避免快速剪辑产生大量投影片。
 
         参数：
-            timestamp: 时间戳（秒）
-            output_path: 输出图片路径
+            threshold: 场景变化阈值（0-1，越小越敏感）
+            store: 截取帧的写入位置（以场景序号为键，JPEG）
+            max_size: 输出帧最大尺寸（宽, 高），等比缩放
+            min_interval: 相邻场景的最小间隔（秒）
+            duration: 影片时长（秒），用于计算进度
+            progress_callback: 进度回调，接受 0-100 整数
+
+        返回：
+            各场景的起始时间列表（秒，升序；失败时为空列表）
         """
+        from PIL import Image
+
+        size = self._fit_size(max_size)
+        frame_bytes = size[0] * size[1] * 3
+        expr = f"eq(n,0)+gt(scene,{threshold})*gte(t-prev_selected_t,{min_interval})"
         cmd = [
-            self.ffmpeg_path,
-            "-ss", f"{timestamp:.3f}",
+            self.ffmpeg_path, "-hide_banner", "-nostats",
             "-i", str(self.video_path),
-            "-vframes", "1",
-            "-q:v", "2",          # JPEG 质量（2 为高质量）
-            "-y",                  # 覆盖已有文件
-            str(output_path),
+            "-an", "-sn",
+            "-vf", f"{self._scale_filter(size)},select='{expr}',showinfo",
+            "-fps_mode", "passthrough",
+            "-f", "rawvideo",
+            "-pix_fmt", "rgb24",
+            "pipe:1",
         ]
+        report = self._progress_reporter(100, progress_callback)
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
-        def _run():
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=30,
-            )
-            if result.returncode != 0:
-                raise RuntimeError(f"FFmpeg 错误: {result.stderr[-500:]}")
+        # stderr 由独立线程读取（showinfo 帧时间入队），避免管道写满阻塞 FFmpeg
+        pts_queue: queue.Queue = queue.Queue()
+        tail: list[str] = []
+
+        def _read_stderr() -> None:
+            for raw in proc.stderr:
+                line = raw.decode("utf-8", errors="replace")
+                m = _SHOWINFO_RE.search(line)
+                if m:
+                    pts_queue.put(float(m.group(2)))
+                else:
+                    tail[:] = (tail + [line])[-20:]
+
+        reader = threading.Thread(target=_read_stderr, daemon=True)
+        reader.start()
+
+        cuts: list[float] = []
+        try:
+            while True:
+                buf = proc.stdout.read(frame_bytes)
+                if len(buf) < frame_bytes:
+                    break
+                pts = max(0.0, pts_queue.get(timeout=30))
+                out = io.BytesIO()
+                Image.frombytes("RGB", size, buf).save(out, format="JPEG", quality=95)
+                store.put([len(cuts)], out.getvalue())
+                cuts.append(pts)
+                if duration > 0:
+                    report(int(pts / duration * 100))
+        finally:
+            proc.stdout.close()
+            returncode = proc.wait()
+            reader.join(timeout=5)
+
+        if returncode != 0 and not cuts:
+            logger.warning(f"场景检测失败: {''.join(tail)[-500:]}")
+            return []
+        logger.info(f"场景检测完成: {len(cuts)} 个场景（阈值 {threshold}）")
+        return cuts
+
+    @staticmethod
+    def _decode_jpeg(data: bytes):
+        """将 JPEG bytes 解码为 PIL RGB 图片。"""
+        from PIL import Image
+
+        with Image.open(io.BytesIO(data)) as img:
+            return img.convert("RGB")
+
+    def _snap_targets(self, jobs: list[tuple[int, float]]) -> dict[float, list[int]]:
+        """
+        将时间点吸附到容差内最近的关键帧（同步，首次调用时建立关键帧索引）。
+
+        参数：
+            jobs: (片段序号, 时间戳) 列表
+
+        返回：
+            {关键帧时间戳: 吸附到该关键帧的片段序号列表}，容差内没有关键帧的片段不在其中
+        """
+        snapped: dict[float, list[int]] = {}
+        keyframes = self.probe.snap([ts for _, ts in jobs], self.snap_tolerance)
+        for (idx, _), keyframe in zip(jobs, keyframes):
+            if keyframe is not None:
+                snapped.setdefault(keyframe, []).append(idx)
+        count = sum(len(indices) for indices in snapped.values())
+        logger.info(f"关键帧吸附: {count}/{len(jobs)} 段吸附到 {len(snapped)} 个关键帧（容差 ±{self.snap_tolerance * 1000:.0f}ms）")
+        return snapped
+
+    @staticmethod
+    def _seek_args(timestamp: float, keyframe: bool = False) -> list[str]:
+        """
+        构造逐帧提取的 FFmpeg 输入 seek 参数。
+
+        keyframe 为 True 时时间戳须为关键帧：关闭精确 seek 直接从 seek 落点（即该关键帧）输出，
+        并只解码关键帧，不解码任何中间帧（时间略微后移，避免浮点舍入落到前一个关键帧）。
+        """
+        if keyframe:
+            return ["-skip_frame", "nokey", "-noaccurate_seek", "-ss", f"{timestamp + 0.0005:.4f}"]
+        return ["-ss", f"{timestamp:.3f}"]
+
+    @staticmethod
+    def _midpoint(seg: SubtitleSegment) -> float:
+        """返回片段时间中间点（与字幕显示内容最贴合）。"""
+        return (seg.start + seg.end) / 2.0
+
+    @staticmethod
+    def _progress_reporter(
+        total: int,
+        progress_callback: Optional[Callable[[int], None]],
+    ) -> Callable[[int], None]:
+        """构造按已完成帧数上报进度的函数，百分比不变时不重复回调。"""
+        last_pct = -1
+
+        def report(count: int) -> None:
+            nonlocal last_pct
+            if not progress_callback or total == 0:
+                return
+            pct = int(min(count, total) / total * 100)
+            if pct != last_pct:
+                last_pct = pct
+                progress_callback(pct)
+
+        return report
+
+    async def _extract_select(
+        self,
+        jobs: list[tuple[int, float]],
+        runner: Callable[..., set[int]],
+        on_frame: Optional[Callable[[int], None]] = None,
+    ) -> set[int]:
+        """
+        按提取模式调度 select 解码：single_pass 整片解码一次；
+        parallel 将时间戳按时间顺序切成连续区间，每个区间由一个 FFmpeg 进程解码。
+
+        参数：
+            jobs: (片段序号, 时间戳) 列表
+            runner: 单个 FFmpeg 进程的执行函数（_run_select_raw）
+            on_frame: 每输出一帧时回调，参数为累计输出帧数
 
+        返回：
+            成功提取的片段序号集合
+        """
         loop = asyncio.get_event_loop()
+        executor = _extract_executor()
+        step = 1.0 / (await loop.run_in_executor(executor, self._probe_frame_rate) or 25.0)
+
+        if self.mode != "parallel" or self.workers <= 1:
+            return await loop.run_in_executor(executor, runner, jobs, step, on_frame)
+
+        ordered = sorted(jobs, key=lambda job: job[1])
+        n_ranges = min(self.workers, len(ordered))
+        size = -(-len(ordered) // n_ranges)
+        ranges = [ordered[i:i + size] for i in range(0, len(ordered), size)]
+
+        # 各区间在线程中回调，汇总为累计输出帧数
+        lock = threading.Lock()
+        emitted = 0
+
+        def _on_range_frame(_: int) -> None:
+            nonlocal emitted
+            with lock:
+                emitted += 1
+                count = emitted
+            if on_frame:
+                on_frame(count)
+
+        results = await asyncio.gather(
+            *[
+                loop.run_in_executor(
+                    executor,
+                    functools.partial(
+                        runner,
+                        chunk,
+                        step,
+                        _on_range_frame,
+                        seek=(max(0.0, chunk[0][1] - step), chunk[-1][1] + 2 * step),
+                        threads=1,
+                    ),
+                )
+                for chunk in ranges
+            ],
+            return_exceptions=True,
+        )
+
+        extracted: set[int] = set()
+        for chunk, result in zip(ranges, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"区间提取失败 [{chunk[0][1]:.1f}s-{chunk[-1][1]:.1f}s]: {result}")
+                continue
+            extracted |= result
+        logger.info(f"并行提取: {len(ranges)} 个区间，命中 {len(extracted)}/{len(jobs)} 段")
+        return extracted
+
+    def _select_command(
+        self,
+        script: Path,
+        seek: Optional[tuple[float, float]],
+        threads: int,
+    ) -> list[str]:
+        """构造 select 解码的 FFmpeg 输入部分参数（不含输出）。"""
+        cmd = [self.ffmpeg_path, "-hide_banner", "-nostats"]
+        if threads:
+            cmd += ["-threads", str(threads), "-filter_threads", str(threads)]
+        if seek:
+            # 区间模式：只解码该区间，保留原始时间戳以便 select 使用绝对时间
+            cmd += ["-ss", f"{seek[0]:.3f}", "-to", f"{seek[1]:.3f}", "-copyts"]
+        return cmd + [
+            "-i", str(self.video_path),
+            "-an", "-sn",
+            "-filter_script:v", str(script),
+            "-fps_mode", "passthrough",   # 只输出被选中的帧，不补帧
+        ]
+
+    @staticmethod
+    def _write_select_script(script: Path, targets: list[float], step: float, extra: str = "") -> None:
+        """写入 select 滤镜脚本：每个目标时间点选取 [t, t+帧间隔] 窗口内的帧（表达式较长，不走命令行）。"""
+        expr = "+".join(f"between(t,{ts:.3f},{ts + step:.3f})" for ts in targets)
+        script.write_text(f"select='{expr}',showinfo{extra}", encoding="utf-8")
+
+    def _run_select_raw(
+        self,
+        jobs: list[tuple[int, float]],
+        step: float,
+        on_frame: Optional[Callable[[int], None]] = None,
+        seek: Optional[tuple[float, float]] = None,
+        threads: int = 0,
+        *,
+        size: tuple[int, int],
+        on_image: ImageCallback,
+    ) -> set[int]:
+        """
+        select 解码：缩放后的 RGB 原始帧经 stdout 管道输出，逐帧交给 on_image。
+
+        帧按时间顺序到达，每帧分配给容差内尚未取得图片的目标时间点。
+
+        参数：
+            jobs: (片段序号, 时间戳) 列表
+            step: 帧间隔（秒）
+            on_frame: 每输出一帧时回调，参数为本次已输出帧数
+            seek: 仅解码的 (起, 止) 时间区间，None 表示整片
+            threads: FFmpeg 解码线程数，0 表示由 FFmpeg 自动决定
+            size: 输出帧尺寸（宽, 高）
+            on_image: 帧回调，接收 (片段序号列表, PIL RGB 图片)
+
+        返回：
+            成功交付图片的片段序号集合
+        """
+        from PIL import Image
+
+        by_target: dict[float, list[int]] = {}
+        for idx, ts in jobs:
+            by_target.setdefault(round(ts, 3), []).append(idx)
+        targets = sorted(by_target)
+        filled = [False] * len(targets)
+        tolerance = step * self.SINGLE_PASS_TOLERANCE
+        width, height = size
+        frame_bytes = width * height * 3
+
+        fd, script_name = tempfile.mkstemp(prefix="select_", suffix=".txt")
+        os.close(fd)
+        script = Path(script_name)
         try:
-            await loop.run_in_executor(None, _run)
-        except Exception as e:
-            logger.error(f"提取帧失败 t={timestamp:.3f}s: {e}")
-            # 提取失败时创建空文件占位
-            output_path.touch()
+            self._write_select_script(script, targets, step, f",{self._scale_filter(size)}")
+            cmd = self._select_command(script, seek, threads) + [
+                "-f", "rawvideo",
+                "-pix_fmt", "rgb24",
+                "pipe:1",
+            ]
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
-    async def get_video_dimensions(self) -> tuple[int, int]:
+            # stderr 由独立线程读取（showinfo 帧时间入队），避免管道写满阻塞 FFmpeg
+            pts_queue: queue.Queue = queue.Queue()
+            tail: list[str] = []
+
+            def _read_stderr() -> None:
+                for raw in proc.stderr:
+                    line = raw.decode("utf-8", errors="replace")
+                    m = _SHOWINFO_RE.search(line)
+                    if m:
+                        pts_queue.put(float(m.group(2)))
+                    else:
+                        tail[:] = (tail + [line])[-20:]
+
+            reader = threading.Thread(target=_read_stderr, daemon=True)
+            reader.start()
+
+            extracted: set[int] = set()
+            emitted = 0
+            try:
+                while True:
+                    buf = proc.stdout.read(frame_bytes)
+                    if len(buf) < frame_bytes:
+                        break
+                    pts = pts_queue.get(timeout=30)
+                    emitted += 1
+                    if on_frame:
+                        on_frame(emitted)
+
+                    lo = bisect.bisect_left(targets, pts - tolerance)
+                    hi = bisect.bisect_right(targets, pts + tolerance)
+                    indices = []
+                    for t in range(lo, hi):
+                        if not filled[t]:
+                            filled[t] = True
+                            indices.extend(by_target[targets[t]])
+                    if indices:
+                        on_image(indices, Image.frombytes("RGB", size, buf))
+                        extracted.update(indices)
+            finally:
+                proc.stdout.close()
+                returncode = proc.wait()
+                reader.join(timeout=5)
+
+            if returncode != 0 and not extracted:
+                raise RuntimeError(f"FFmpeg 错误: {''.join(tail)[-500:]}")
+            logger.debug(f"内存 select 解码: 目标 {len(targets)} 个时间点，输出 {emitted} 帧，命中 {len(extracted)} 段")
+            return extracted
+        finally:
+            script.unlink(missing_ok=True)
+
+    def _grab_frame(self, timestamp: float, size: tuple[int, int], keyframe: bool = False):
         """
-        获取影片分辨率。
+        逐帧回退：seek 到时间戳后输出一帧缩放的 RGB 原始数据。
+
+        参数：
+            timestamp: 时间戳（秒）
+            size: 输出帧尺寸（宽, 高）
+            keyframe: 时间戳为关键帧时直接取该关键帧，不解码中间帧
 
         返回：
-            (宽, 高) 像素元组
+            PIL RGB 图片，失败时返回 None
         """
+        from PIL import Image
+
+        cmd = [
+            self.ffmpeg_path,
+            *self._seek_args(timestamp, keyframe),
+            "-i", str(self.video_path),
+            "-frames:v", "1",
+            "-vf", self._scale_filter(size),
+            "-f", "rawvideo",
+            "-pix_fmt", "rgb24",
+            "pipe:1",
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, timeout=30)
+            if result.returncode != 0 or len(result.stdout) < size[0] * size[1] * 3:
+                raise RuntimeError(f"FFmpeg 错误: {result.stderr.decode('utf-8', errors='replace')[-500:]}")
+            return Image.frombytes("RGB", size, result.stdout[: size[0] * size[1] * 3])
+        except Exception as e:
+            logger.error(f"提取帧失败 t={timestamp:.3f}s: {e}")
+            return None
+
+    @classmethod
+    def _scale_filter(cls, size: tuple[int, int]) -> str:
+        """返回缩放到指定尺寸的 FFmpeg 滤镜。"""
+        return f"scale={size[0]}:{size[1]}:flags={cls.SCALE_FLAGS}"
+
+    def _fit_size(self, max_size: tuple[int, int]) -> tuple[int, int]:
+        """按影片分辨率计算等比缩放到 max_size 以内的输出尺寸（偶数像素）。"""
+        width, height = self._probe_dimensions()
+        scale = min(max_size[0] / width, max_size[1] / height, 1.0)
+        return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+    def _probe_frame_rate(self) -> float:
+        """使用 ffprobe 获取影片平均帧率，失败时返回 0。"""
+        cmd = [
+            self.ffprobe_path,
+            "-v", "quiet",
+            "-select_streams", "v:0",
+            "-show_entries", "stream=avg_frame_rate,r_frame_rate",
+            "-of", "default=noprint_wrappers=1:nokey=1",
+            str(self.video_path),
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=15)
+        except Exception as e:
+            logger.warning(f"获取帧率失败: {e}")
+            return 0.0
+        for line in result.stdout.splitlines():
+            num, _, den = line.strip().partition("/")
+            try:
+                rate = float(num) / float(den or 1)
+            except (ValueError, ZeroDivisionError):
+                continue
+            if rate > 0:
+                return rate
+        return 0.0
+
+    def _probe_dimensions(self) -> tuple[int, int]:
+        """使用 ffprobe 获取影片分辨率（同步），失败时返回 1280x720。"""
+        import json
+
         cmd = [
-            "ffprobe",
+            self.ffprobe_path,
             "-v", "quiet",
             "-print_format", "json",
             "-show_streams",
             str(self.video_path),
         ]
-
-        def _run():
-            import json
+        try:
             result = subprocess.run(cmd, capture_output=True, text=True, timeout=15)
             data = json.loads(result.stdout)
-            for stream in data.get("streams", []):
-                if stream.get("codec_type") == "video":
-                    return stream.get("width", 1280), stream.get("height", 720)
+        except Exception as e:
+            logger.warning(f"获取影片分辨率失败: {e}")
             return 1280, 720
+        for stream in data.get("streams", []):
+            if stream.get("codec_type") == "video":
+                return stream.get("width", 1280), stream.get("height", 720)
+        return 1280, 720
+
+    async def get_video_dimensions(self) -> tuple[int, int]:
+        """
+        获取影片分辨率。
 
+        返回：
+            (宽, 高) 像素元组
+        """
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, _run)
+        return await loop.run_in_executor(None, self._probe_dimensions)
@@ -0,0 +1,183 @@
+"""帧缓存服务：按影片 + 时间戳 + 输出尺寸缓存提取的帧，重新处理同一影片时只提取变化的时间点。"""
+
+import io
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Optional
+from loguru import logger
+
+from app.services.frame_store import PackedFrameStore, open_store, release_store, remove_store
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    logger.warning("Pillow 未安装，帧缓存功能不可用")
+
+
+class FrameCache:
+    """
+    跨任务共享的帧缓存。
+
+    缓存键为 (影片标识, 量化后的时间戳, 输出尺寸)，与片段序号无关：
+    重新解析字幕、翻译或分段改变后，时间点未变的帧仍可命中。
+    每个影片的每种输出尺寸对应一个打包帧存储 {root}/{影片标识}/{宽}x{高}.pack/.idx，
+    命中时刷新索引文件的修改时间，按存储整体淘汰最久未用的影片。
+    存储句柄在任务内复用，任务结束时调用 close() 释放。
+    """
+
+    # 时间戳量化粒度（毫秒）：与常见帧间隔相当，落在同一粒度内的时间点取到的是同一帧
+    QUANTUM_MS = 40
+
+    # 缓存帧的 JPEG 质量（编码前的中间图，取高质量避免二次压缩损失）
+    QUALITY = 95
+
+    def __init__(self, root: Path, video_key: str):
+        """
+        初始化帧缓存。
+
+        参数：
+            root: 缓存根目录
+            video_key: 影片标识（如 YouTube 影片 ID + 画质），不同下载的影片不可共用
+        """
+        self.root = root
+        self.video_key = re.sub(r"[^\w.-]", "_", video_key) or "_"
+        self._stores: dict[tuple[int, int], PackedFrameStore] = {}
+        self._lock = threading.Lock()
+
+    def key(self, timestamp: float) -> int:
+        """返回时间戳的量化缓存键。"""
+        return round(timestamp * 1000 / self.QUANTUM_MS)
+
+    def lookup(self, timestamps: list[float], size: tuple[int, int]) -> dict[int, list[int]]:
+        """
+        查找已缓存的时间点。
+
+        参数：
+            timestamps: 与片段一一对应的取帧时间（秒）
+            size: 输出帧尺寸（宽, 高）
+
+        返回：
+            {缓存键: 命中该键的片段序号列表}
+        """
+        store = self._store(size)
+        cached = store.keys()
+        if not cached:
+            return {}
+        try:
+            os.utime(store.index_path)
+        except OSError:
+            pass
+        hits: dict[int, list[int]] = {}
+        for idx, ts in enumerate(timestamps):
+            key = self.key(ts)
+            if key in cached:
+                hits.setdefault(key, []).append(idx)
+        return hits
+
+    def load(self, key: int, size: tuple[int, int]) -> Optional["Image.Image"]:
+        """
+        读取并解码一帧缓存。
+
+        返回：
+            RGB 图片，缓存缺失或损坏时返回 None
+        """
+        data = self.load_bytes(key, size)
+        if data is None:
+            return None
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                return img.convert("RGB")
+        except Exception as e:
+            logger.debug(f"解码缓存帧失败 key={key}: {e}")
+            return None
+
+    def load_bytes(self, key: int, size: tuple[int, int]) -> Optional[bytes]:
+        """读取一帧缓存的 JPEG bytes，缺失或读取失败时返回 None。"""
+        try:
+            return self._store(size).get(key)
+        except (OSError, ValueError) as e:
+            logger.debug(f"读取缓存帧失败 key={key}: {e}")
+            return None
+
+    def store(self, timestamps: list[float], size: tuple[int, int], image: "Image.Image") -> None:
+        """
+        缓存一帧（多个时间点共用同一帧时只编码、写入一次）；写入失败只记录日志，不影响提取。
+
+        参数：
+            timestamps: 共用该帧的取帧时间列表
+            size: 输出帧尺寸（宽, 高）
+            image: RGB 图片
+        """
+        buf = io.BytesIO()
+        image.save(buf, format="JPEG", quality=self.QUALITY)
+        self.store_bytes(timestamps, size, buf.getvalue())
+
+    def store_bytes(self, timestamps: list[float], size: tuple[int, int], data: bytes) -> None:
+        """缓存一帧已编码的 JPEG bytes。"""
+        try:
+            self._store(size).put({self.key(ts) for ts in timestamps}, data)
+        except OSError as e:
+            logger.warning(f"写入帧缓存失败: {e}")
+
+    def close(self) -> None:
+        """释放本任务打开的存储句柄（其他任务仍在使用的存储保持打开）。"""
+        with self._lock:
+            stores = list(self._stores.values())
+            self._stores.clear()
+        for store in stores:
+            release_store(store)
+
+    def _store(self, size: tuple[int, int]) -> PackedFrameStore:
+        """返回该影片某一输出尺寸的打包帧存储（进程内共享句柄，首次使用时登记）。"""
+        with self._lock:
+            store = self._stores.get(size)
+            if store is None:
+                store = self._stores[size] = open_store(self.root / self.video_key / f"{size[0]}x{size[1]}")
+            return store
+
+
+def prune_frame_cache(root: Path, max_bytes: int) -> int:
+    """
+    按最近使用时间淘汰整个影片尺寸的帧存储，使缓存总大小不超过上限（同步，在线程池中调用）。
+
+    参数：
+        root: 缓存根目录
+        max_bytes: 缓存总大小上限（字节）
+
+    返回：
+        删除的存储数
+    """
+    if not root.is_dir():
+        return 0
+    entries = []
+    total = 0
+    for index_path in root.glob("*/*.idx"):
+        prefix = index_path.with_suffix("")
+        try:
+            used = index_path.stat().st_mtime
+            nbytes = index_path.stat().st_size + prefix.with_name(prefix.name + ".pack").stat().st_size
+        except OSError:
+            continue
+        entries.append((used, nbytes, prefix))
+        total += nbytes
+    if total <= max_bytes:
+        return 0
+
+    removed = 0
+    entries.sort()
+    for _, nbytes, prefix in entries:
+        if total <= max_bytes:
+            break
+        remove_store(prefix)
+        try:
+            prefix.parent.rmdir()  # 该影片已无其他尺寸的存储时删除空目录
+        except OSError:
+            pass
+        total -= nbytes
+        removed += 1
+    logger.info(f"帧缓存淘汰 {removed} 个影片存储，剩余 {total / 1024 / 1024:.0f} MB")
+    return removed
@@ -0,0 +1,190 @@
+"""打包帧存储：帧数据追加写入单个数据文件，另以偏移索引文件定位，读取经 mmap，避免成千上万个小文件。"""
+
+import mmap
+import struct
+import threading
+from pathlib import Path
+from typing import Iterable, Optional
+from loguru import logger
+
+# 进程内共享的存储句柄（同一文件只有一个写入者，偏移不会交错）及其使用者计数，计数归零时关闭
+_stores: dict[Path, "PackedFrameStore"] = {}
+_store_refs: dict[Path, int] = {}
+_stores_lock = threading.Lock()
+
+
+class PackedFrameStore:
+    """
+    只追加的打包帧存储：{name}.pack 存放帧数据，{name}.idx 存放 (键, 偏移, 长度) 定长记录。
+
+    先写数据再写索引记录，进程中途退出最多丢失最后一帧：打开时丢弃不完整或越界的索引记录。
+    同一键重复写入时以最后一条记录为准。线程安全。
+    """
+
+    # 索引记录：键（int64）、偏移（uint64）、长度（uint32）
+    RECORD = struct.Struct("<qQI")
+
+    def __init__(self, path: Path):
+        """
+        打开（不存在时在首次写入时创建）打包帧存储。
+
+        参数：
+            path: 存储路径前缀（不含扩展名）
+        """
+        self.path = path
+        self.data_path = path.with_name(path.name + ".pack")
+        self.index_path = path.with_name(path.name + ".idx")
+        self._lock = threading.Lock()
+        self._index: dict[int, tuple[int, int]] = {}
+        self._end = 0
+        self._data_fh = None
+        self._index_fh = None
+        self._map: Optional[mmap.mmap] = None
+        self._load_index()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._index
+
+    def keys(self) -> set[int]:
+        """返回已存储的全部键。"""
+        with self._lock:
+            return set(self._index)
+
+    def put(self, keys: Iterable[int], data: bytes) -> None:
+        """
+        追加一帧数据；多个键共用同一帧时数据只写一次。
+
+        参数：
+            keys: 该帧的键列表
+            data: 帧数据（如 JPEG bytes）
+        """
+        keys = list(keys)
+        if not keys or not data:
+            return
+        with self._lock:
+            if self._data_fh is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._data_fh = self.data_path.open("ab")
+                self._index_fh = self.index_path.open("ab")
+            offset = self._end
+            self._data_fh.write(data)
+            self._data_fh.flush()
+            self._end += len(data)
+            self._index_fh.write(b"".join(self.RECORD.pack(key, offset, len(data)) for key in keys))
+            self._index_fh.flush()
+            for key in keys:
+                self._index[key] = (offset, len(data))
+
+    def get(self, key: int) -> Optional[bytes]:
+        """
+        读取一帧数据（经 mmap，数据文件增长后自动重新映射）。
+
+        返回：
+            帧数据，键不存在时返回 None
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            offset, length = entry
+            if self._map is None or offset + length > len(self._map):
+                if self._map is not None:
+                    self._map.close()
+                with self.data_path.open("rb") as fh:
+                    self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._map[offset:offset + length]
+
+    def close(self) -> None:
+        """关闭文件句柄与内存映射。"""
+        with self._lock:
+            for fh in (self._data_fh, self._index_fh, self._map):
+                if fh is not None:
+                    fh.close()
+            self._data_fh = self._index_fh = self._map = None
+
+    def remove(self) -> None:
+        """关闭并删除存储文件。"""
+        self.close()
+        with self._lock:
+            self.data_path.unlink(missing_ok=True)
+            self.index_path.unlink(missing_ok=True)
+            self._index.clear()
+            self._end = 0
+
+    def _load_index(self) -> None:
+        """读取索引文件，截掉不完整的尾部记录并丢弃指向数据文件之外的记录。"""
+        try:
+            self._end = self.data_path.stat().st_size
+        except FileNotFoundError:
+            # 数据文件缺失时残留的索引记录全部无效
+            self.index_path.unlink(missing_ok=True)
+            return
+        try:
+            raw = self.index_path.read_bytes()
+        except FileNotFoundError:
+            return
+        valid = len(raw) - len(raw) % self.RECORD.size
+        if valid != len(raw):
+            logger.warning(f"帧存储索引尾部不完整，已截断: {self.index_path}")
+            with self.index_path.open("r+b") as fh:
+                fh.truncate(valid)
+        for key, offset, length in self.RECORD.iter_unpack(raw[:valid]):
+            if offset + length <= self._end:
+                self._index[key] = (offset, length)
+
+
+def open_store(path: Path) -> PackedFrameStore:
+    """
+    返回进程内共享的打包帧存储（多个任务同时写入同一存储时共用一个句柄）。
+
+    每次调用登记一个使用者，用完后须调用 release_store 释放。
+
+    参数：
+        path: 存储路径前缀（不含扩展名）
+    """
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = PackedFrameStore(path)
+        _store_refs[path] = _store_refs.get(path, 0) + 1
+        return store
+
+
+def release_store(store: PackedFrameStore) -> None:
+    """释放 open_store 取得的存储；最后一个使用者释放时关闭文件句柄与内存映射。"""
+    with _stores_lock:
+        if _stores.get(store.path) is not store:
+            # 已被 remove_store 移出共享表，由当前使用者直接关闭
+            store.close()
+            return
+        _store_refs[store.path] -= 1
+        if _store_refs[store.path] > 0:
+            return
+        del _stores[store.path], _store_refs[store.path]
+    store.close()
+
+
+def remove_store(path: Path) -> None:
+    """关闭并删除打包帧存储（含进程内共享的句柄）。"""
+    with _stores_lock:
+        store = _stores.pop(path, None)
+        _store_refs.pop(path, None)
+    (store or PackedFrameStore(path)).remove()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="将打包帧存储导出为单张 JPEG 文件（调试用）")
+    parser.add_argument("store", type=Path, help="存储路径前缀（不含 .pack/.idx 扩展名）")
+    parser.add_argument("output", type=Path, help="导出目录")
+    args = parser.parse_args()
+
+    store = PackedFrameStore(args.store)
+    args.output.mkdir(parents=True, exist_ok=True)
+    for key in sorted(store.keys()):
+        (args.output / f"frame_{key:05d}.jpg").write_bytes(store.get(key))
+    print(f"已导出 {len(store)} 帧到 {args.output}")
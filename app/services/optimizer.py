@@ -1,107 +1,205 @@
-"""图片优化服务：使用 Pillow 压缩帧图片并转换为 Base64。"""
+"""图片优化服务：使用 Pillow 缩放并编码帧图片（JPEG / WebP / AVIF），支持进程池并行编码。"""
 
+import asyncio
 import base64
 import io
-from pathlib import Path
-from typing import Optional
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Iterator, Optional
 from loguru import logger
 
+from app.config import settings
+
 try:
-    from PIL import Image
+    from PIL import Image, ImageOps
     PIL_AVAILABLE = True
 except ImportError:
     PIL_AVAILABLE = False
     logger.warning("Pillow 未安装，图片优化功能不可用")
 
+# 帧来源：内存中已解码的图片（None 表示提取失败）
+FrameSource = Optional["Image.Image"]
+
+
+class ImageCodec:
+    """图片编码格式：JPEG（渐进式、优化霍夫曼表）。子类覆盖格式名与保存参数即可接入新格式。"""
+
+    name = "jpeg"
+    mime = "image/jpeg"
+    ext = "jpg"
+    pil_format = "JPEG"
+
+    def available(self) -> bool:
+        """当前 Pillow 是否支持以该格式保存。"""
+        if not PIL_AVAILABLE:
+            return False
+        Image.init()
+        return self.pil_format in Image.SAVE
+
+    def save_options(self, quality: int) -> dict:
+        """返回 Pillow 保存参数。"""
+        return {"quality": quality, "optimize": True, "progressive": True}
+
+    def encode(self, img: "Image.Image", quality: int) -> bytes:
+        """将图片编码为该格式的 bytes。"""
+        buf = io.BytesIO()
+        img.save(buf, format=self.pil_format, **self.save_options(quality))
+        return buf.getvalue()
+
+
+class WebPCodec(ImageCodec):
+    """WebP 编码（有损，method=4 兼顾速度与体积）。"""
+
+    name = "webp"
+    mime = "image/webp"
+    ext = "webp"
+    pil_format = "WEBP"
+
+    def save_options(self, quality: int) -> dict:
+        return {"quality": quality, "method": 4}
+
+
+class AvifCodec(ImageCodec):
+    """AVIF 编码（需 Pillow 编译了 libavif，或安装 pillow-avif-plugin）。"""
+
+    name = "avif"
+    mime = "image/avif"
+    ext = "avif"
+    pil_format = "AVIF"
+
+    def available(self) -> bool:
+        try:
+            import pillow_avif  # noqa: F401  旧版 Pillow 通过插件注册 AVIF
+        except ImportError:
+            pass
+        return super().available()
+
+    def save_options(self, quality: int) -> dict:
+        return {"quality": quality, "speed": 6}
+
+
+IMAGE_CODECS: dict[str, ImageCodec] = {codec.name: codec for codec in (ImageCodec(), WebPCodec(), AvifCodec())}
+
+
+def get_codec(name: str) -> ImageCodec:
+    """
+    按名称返回图片编码格式；未知或当前 Pillow 不支持时回退为 JPEG。
+
+    参数：
+        name: jpeg / webp / avif
+    """
+    codec = IMAGE_CODECS.get(name.lower())
+    if codec is None:
+        logger.warning(f"未知图片格式 {name}，使用 JPEG")
+        return IMAGE_CODECS["jpeg"]
+    if codec.name != "jpeg" and not codec.available():
+        logger.warning(f"当前 Pillow 不支持 {codec.name.upper()} 编码，回退为 JPEG")
+        return IMAGE_CODECS["jpeg"]
+    return codec
+
 
 class ImageOptimizer:
-    """图片压缩与 Base64 编码工具。"""
+    """帧图片的缩放与编码工具。"""
 
     # 输出图片最大尺寸（宽 x 高）
     MAX_WIDTH = 1280
     MAX_HEIGHT = 720
 
-    def __init__(self, quality: int = 75):
+    # 侧边栏缩略图尺寸
+    THUMB_WIDTH = 240
+    THUMB_HEIGHT = 135
+
+    # 缩放时先用 reduce() 整数倍快速降采样，剩余不足 2 倍的部分再用 LANCZOS
+    REDUCING_GAP = 2.0
+
+    # 目标体积模式下质量搜索的下限
+    MIN_QUALITY = 20
+
+    def __init__(self, quality: int = 75, image_format: str = "jpeg", target_bytes: int = 0):
         """
         初始化图片优化器。
 
         参数：
-            quality: JPEG 压缩质量（1-95，越高质量越好文件越大）
+            quality: 压缩质量（1-95，越高质量越好文件越大；目标体积模式下为质量上限）
+            image_format: 主图与缩略图的编码格式（jpeg / webp / avif）
+            target_bytes: 单张主图目标体积，超出时按帧二分查找满足目标的最高质量（0 表示固定质量）
         """
         self.quality = max(1, min(95, quality))
+        self.codec = get_codec(image_format)
+        self.target_bytes = target_bytes
 
-    def thumbnail_to_base64(self, image_path: Path, thumb_quality: int = 25) -> str:
+    def optimize_frame(self, source: FrameSource) -> tuple[bytes, Optional[bytes]]:
         """
-        生成低质量缩略图 Base64，用于侧边栏预览（尺寸小，加载快）。
+        编码主图 bytes（格式见 self.codec），并由已缩放的主图裁切出侧边栏格子的原始像素。
+
+        格子不做有损编码，由精灵图拼接后统一编码一次。
 
         参数：
-            image_path: 图片文件路径
-            thumb_quality: 缩略图 JPEG 质量（默认 25）
+            source: 内存中的 PIL 图片
 
         返回：
-            形如 'data:image/jpeg;base64,xxxx' 的字符串
+            (主图 bytes, 格子 RGB 原始像素)；格子为 THUMB_WIDTH x THUMB_HEIGHT，提取或编码失败时为 None
         """
-        if not image_path.exists() or image_path.stat().st_size == 0:
-            return self._placeholder_base64()
-
         if not PIL_AVAILABLE:
-            return self._placeholder_base64()
+            return self._placeholder_bytes(), None
 
         try:
-            with Image.open(image_path) as img:
-                if img.mode in ("RGBA", "P", "LA"):
-                    img = img.convert("RGB")
-                img.thumbnail((240, 135), Image.LANCZOS)
-                buf = io.BytesIO()
-                img.save(buf, format="JPEG", quality=thumb_quality)
-                buf.seek(0)
-                encoded = base64.b64encode(buf.read()).decode("utf-8")
-                return f"data:image/jpeg;base64,{encoded}"
+            with self._open(source) as img:
+                if img is None:
+                    return self._placeholder_bytes(), None
+                main = self._fit(img, self.MAX_WIDTH, self.MAX_HEIGHT)
+                return self._encode_main(main), self._tile(main)
         except Exception as e:
-            logger.error(f"缩略图生成失败 {image_path}: {e}")
-            return self._placeholder_base64()
-
-    def optimize_to_base64(self, image_path: Path) -> str:
-        """
-        读取图片文件，压缩优化后转为 Base64 Data URL。
+            logger.error(f"图片优化失败 {self._describe(source)}: {e}")
+            return self._placeholder_bytes(), None
 
-        参数：
-            image_path: 图片文件路径
+    @staticmethod
+    @contextmanager
+    def _open(source: FrameSource) -> Iterator[Optional["Image.Image"]]:
+        """将帧来源转为 RGB；来源为 None 时产出 None。"""
+        if source is None:
+            yield None
+        else:
+            yield source.convert("RGB") if source.mode != "RGB" else source
 
-        返回：
-            形如 'data:image/jpeg;base64,xxxx' 的字符串
-        """
-        if not image_path.exists() or image_path.stat().st_size == 0:
-            return self._placeholder_base64()
+    @staticmethod
+    def _fit(img: "Image.Image", max_width: int, max_height: int) -> "Image.Image":
+        """等比缩放到指定尺寸以内，返回新图片（不修改调用方传入的内存帧）。"""
+        if img.width <= max_width and img.height <= max_height:
+            return img
+        scale = min(max_width / img.width, max_height / img.height)
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        return img.resize(size, Image.LANCZOS, reducing_gap=ImageOptimizer.REDUCING_GAP)
 
-        if not PIL_AVAILABLE:
-            return self._file_to_base64(image_path)
+    @classmethod
+    def _tile(cls, img: "Image.Image") -> bytes:
+        """等比裁切填满侧边栏格子（对应 object-fit: cover），返回 RGB 原始像素。"""
+        return ImageOps.fit(img, (cls.THUMB_WIDTH, cls.THUMB_HEIGHT), Image.LANCZOS).tobytes()
 
-        try:
-            with Image.open(image_path) as img:
-                # 转为 RGB（去除 RGBA 透明通道）
-                if img.mode in ("RGBA", "P", "LA"):
-                    img = img.convert("RGB")
-
-                # 等比缩放
-                img.thumbnail((self.MAX_WIDTH, self.MAX_HEIGHT), Image.LANCZOS)
-
-                # 编码为 JPEG bytes
-                buf = io.BytesIO()
-                img.save(buf, format="JPEG", quality=self.quality)
-                buf.seek(0)
-                encoded = base64.b64encode(buf.read()).decode("utf-8")
-                return f"data:image/jpeg;base64,{encoded}"
-        except Exception as e:
-            logger.error(f"图片优化失败 {image_path}: {e}")
-            return self._placeholder_base64()
+    def _encode_main(self, img: "Image.Image") -> bytes:
+        """编码主图；设置了目标体积且超出时，二分查找不超过目标的最高质量（下限 MIN_QUALITY）。"""
+        data = self.codec.encode(img, self.quality)
+        if not self.target_bytes or len(data) <= self.target_bytes:
+            return data
+        lo, hi = self.MIN_QUALITY, self.quality - 1
+        best = None
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            candidate = self.codec.encode(img, mid)
+            if len(candidate) <= self.target_bytes:
+                best, lo = candidate, mid + 1
+            else:
+                data, hi = candidate, mid - 1
+        # 最低质量仍超出目标时使用最低质量的结果
+        return best or data
 
     @staticmethod
-    def _file_to_base64(image_path: Path) -> str:
-        """直接将文件转为 Base64（Pillow 不可用时的备选）。"""
-        data = image_path.read_bytes()
-        encoded = base64.b64encode(data).decode("utf-8")
-        return f"data:image/jpeg;base64,{encoded}"
+    def _describe(source: FrameSource) -> str:
+        """返回帧来源的简短描述，用于日志。"""
+        return "<内存帧>" if source is not None else "<空帧>"
 
     @staticmethod
     def _placeholder_base64() -> str:
@@ -117,3 +215,226 @@ class ImageOptimizer:
             "AAAA/9oADAMBAAIRAxEAPwCwABmX/9k="
         )
         return PLACEHOLDER
+
+    @classmethod
+    def _placeholder_bytes(cls) -> bytes:
+        """返回 1x1 灰色占位图的 JPEG bytes。"""
+        return base64.b64decode(cls._placeholder_base64().split(",", 1)[1])
+
+
+def _encode_frame_task(
+    source: FrameSource,
+    quality: int,
+    image_format: str,
+    target_bytes: int,
+) -> tuple[bytes, Optional[bytes]]:
+    """进程池任务：编码主图并裁切侧边栏格子（模块级函数，便于子进程序列化调用）。"""
+    return ImageOptimizer(quality, image_format, target_bytes).optimize_frame(source)
+
+
+# 进程内共享的编码进程池，所有任务共用，大小取 CPU 核数（可配置）
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _encode_pool() -> ProcessPoolExecutor:
+    """返回（必要时创建）图片编码共用的进程池。"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.encode_worker_count,
+            # spawn 启动：在多线程的服务进程中 fork 可能复制到被其他线程持有的锁而死锁
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def _discard_encode_pool(pool: ProcessPoolExecutor) -> None:
+    """丢弃已损坏的编码进程池（有工作进程异常退出），下次提交时重新创建。"""
+    global _pool
+    if _pool is pool:
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_encode_pool() -> None:
+    """关闭编码进程池（应用退出时调用）。"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+class ImageEncoderPool:
+    """
+    进程池图片编码器：逐帧异步提交，每帧完成即返回，无批次屏障。
+
+    编码在子进程中进行，绕开 Pillow 缩放/编码的 GIL 争用；跨进程只回传编码后的主图与小尺寸的格子像素。
+    """
+
+    def __init__(self, optimizer: ImageOptimizer):
+        """
+        初始化编码器。
+
+        参数：
+            optimizer: 提供压缩参数的图片优化器
+        """
+        self.optimizer = optimizer
+
+    @property
+    def workers(self) -> int:
+        """编码进程数（调用方据此决定同时在途的帧数）。"""
+        return settings.encode_worker_count
+
+    async def encode(self, source: FrameSource) -> tuple[bytes, Optional[bytes]]:
+        """
+        在进程池中编码一帧，单帧编码失败时返回占位图；
+        编码进程异常退出（如内存不足、编码库崩溃）时丢弃进程池并抛出 RuntimeError，任务随之中止。
+
+        参数：
+            source: 内存中的 PIL 图片
+
+        返回：
+            (主图 bytes, 格子 RGB 原始像素或 None)，见 ImageOptimizer.optimize_frame
+        """
+        pool = _encode_pool()
+        future = pool.submit(
+            _encode_frame_task,
+            source,
+            self.optimizer.quality,
+            self.optimizer.codec.name,
+            self.optimizer.target_bytes,
+        )
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool as e:
+            _discard_encode_pool(pool)
+            logger.error(f"图片编码进程异常退出，进程池将在下次提交时重建: {e}")
+            raise RuntimeError("图片编码进程异常退出") from e
+        except Exception as e:
+            logger.error(f"图片编码失败: {e}")
+            return ImageOptimizer._placeholder_bytes(), None
+
+
+class SpriteSheetPacker:
+    """
+    缩略图精灵图打包器：按投影片序号每 PER_SHEET 张一组拼接为一张精灵图，并给出每张投影片的格子坐标。
+
+    格子为编码进程裁切好的原始像素，拼接只做粘贴与一次编码（调用方应在事件循环之外调用）。
+    格子到达顺序任意；一组投影片全部到齐即拼接该组并释放其格子，同一帧在组内只占一格。
+    侧边栏以 CSS 背景定位显示格子，图片请求与解码次数约为逐张缩略图的百分之一。
+    """
+
+    PER_SHEET = 100
+    COLUMNS = 10
+
+    def __init__(self, slide_count: int, quality: int = 25, codec: Optional[ImageCodec] = None):
+        """
+        初始化打包器。
+
+        参数：
+            slide_count: 投影片总数
+            quality: 精灵图压缩质量（格子未经有损编码，只在此编码一次）
+            codec: 精灵图编码格式（默认 JPEG）
+        """
+        self.quality = quality
+        self.codec = codec or IMAGE_CODECS["jpeg"]
+        sheet_count = math.ceil(slide_count / self.PER_SHEET)
+        self._tiles: list[Optional[list[Optional[bytes]]]] = [[] for _ in range(sheet_count)]
+        self._pending = [
+            min(self.PER_SHEET, slide_count - sheet * self.PER_SHEET) for sheet in range(sheet_count)
+        ]
+        self._coords: list[Optional[tuple[int, int]]] = [None] * slide_count
+        self._seen = bytearray(slide_count)
+        self._grids: list[Optional[tuple[int, int]]] = [None] * sheet_count
+
+    def add(self, indices: list[int], thumb: Optional[bytes]) -> list[tuple[int, bytes]]:
+        """
+        登记一帧的格子（共用该帧的所有投影片序号）。
+
+        参数：
+            indices: 共用该帧的投影片序号列表
+            thumb: 格子 RGB 原始像素（None 表示提取失败，格子留空）
+
+        返回：
+            因此到齐并拼接完成的精灵图列表 [(组号, 图片 bytes), ...]
+        """
+        done = []
+        for sheet, members in self._claim(indices).items():
+            tiles = self._tiles[sheet]
+            for idx in members:
+                self._coords[idx] = (sheet, len(tiles))
+            tiles.append(thumb)
+            done.extend(self._settle(sheet, len(members)))
+        return done
+
+    def skip(self, indices: list[int]) -> list[tuple[int, bytes]]:
+        """
+        登记无需格子的投影片（复用其他帧的去重投影片，坐标由调用方取自被复用的投影片）。
+
+        返回：
+            因此到齐并拼接完成的精灵图列表
+        """
+        done = []
+        for sheet, members in self._claim(indices).items():
+            done.extend(self._settle(sheet, len(members)))
+        return done
+
+    def _claim(self, indices: list[int]) -> dict[int, list[int]]:
+        """按组归类尚未登记的投影片序号并标记为已登记。"""
+        by_sheet: dict[int, list[int]] = {}
+        for idx in indices:
+            if 0 <= idx < len(self._seen) and not self._seen[idx]:
+                self._seen[idx] = 1
+                by_sheet.setdefault(idx // self.PER_SHEET, []).append(idx)
+        return by_sheet
+
+    def _settle(self, sheet: int, count: int) -> list[tuple[int, bytes]]:
+        """扣减组内待到达数，到齐时拼接（组内没有格子则直接释放）。"""
+        self._pending[sheet] -= count
+        if self._pending[sheet] > 0:
+            return []
+        if not self._tiles[sheet]:
+            self._tiles[sheet] = None
+            return []
+        return [(sheet, self._compose(sheet))]
+
+    def flush(self) -> list[tuple[int, bytes]]:
+        """拼接尚未到齐的组（部分投影片缺帧时，在收尾阶段调用）。"""
+        return [
+            (sheet, self._compose(sheet))
+            for sheet, tiles in enumerate(self._tiles)
+            if tiles
+        ]
+
+    def coords(self, idx: int) -> Optional[tuple[int, int, int]]:
+        """返回投影片在精灵图中的位置 (组号, 列, 行)，未登记时返回 None。"""
+        if self._coords[idx] is None:
+            return None
+        sheet, tile = self._coords[idx]
+        return sheet, tile % self.COLUMNS, tile // self.COLUMNS
+
+    def grid(self, sheet: int) -> tuple[int, int]:
+        """返回已拼接精灵图的网格尺寸 (列数, 行数)。"""
+        return self._grids[sheet]
+
+    def _compose(self, sheet: int) -> bytes:
+        """拼接一组格子并编码。"""
+        tiles = self._tiles[sheet]
+        self._tiles[sheet] = None
+        cols = self.COLUMNS
+        rows = math.ceil(len(tiles) / cols)
+        self._grids[sheet] = (cols, rows)
+
+        width, height = ImageOptimizer.THUMB_WIDTH, ImageOptimizer.THUMB_HEIGHT
+        canvas = Image.new("RGB", (cols * width, rows * height))
+        for tile, data in enumerate(tiles):
+            if not data:
+                continue
+            try:
+                canvas.paste(
+                    Image.frombytes("RGB", (width, height), data),
+                    ((tile % cols) * width, (tile // cols) * height),
+                )
+            except Exception as e:
+                logger.warning(f"精灵图第 {sheet} 组第 {tile} 格拼接失败: {e}")
+        return self.codec.encode(canvas, self.quality)
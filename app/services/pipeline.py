@@ -1,10 +1,12 @@
 """处理流水线协调器：串联 8 个阶段的状态机。"""
 
 import asyncio
+import concurrent.futures
 import re
+import threading
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
+from typing import Awaitable, Callable, Optional
 from loguru import logger
 
 _ANSI_RE = re.compile(r"\x1b\[[0-9;]*m")
@@ -19,10 +21,64 @@ from app.services.subtitle import SubtitleParser
 from app.services.translator import SubtitleTranslator, PunctuationRestorer
 from app.services.ai_outline import AIOutlineGenerator
 from app.services.extractor import KeyframeExtractor
-from app.services.optimizer import ImageOptimizer
+from app.services.frame_cache import FrameCache, prune_frame_cache
+from app.services.frame_store import PackedFrameStore
+from app.services.dedupe import FrameDeduplicator
+from app.services.optimizer import ImageOptimizer, ImageEncoderPool
 from app.services.slide_builder import SlideBuilder
 
 
+class _SlideBuffer:
+    """
+    投影片图片的暂存区：写入器创建前（转录期间）接收 add_encoded / add_alias 调用，写入器就绪后按序重放。
+
+    主图 bytes 与侧边栏格子像素写入任务目录下的打包存储，内存中只保留调用顺序与片段序号，
+    不随片段数增长占用内存。
+    """
+
+    def __init__(self, path: Path):
+        """
+        初始化暂存区（清空上次处理残留的存储）。
+
+        参数：
+            path: 打包存储路径前缀（不含扩展名）
+        """
+        self.store = PackedFrameStore(path)
+        self.store.remove()
+        # (片段序号列表, 存储键或 None, 被复用的片段序号)；存储键 k 为主图、k+1 为格子像素
+        self.entries: list[tuple[list[int], Optional[int], int]] = []
+        self.indices: set[int] = set()
+
+    def add_encoded(self, indices: list[int], image: bytes, thumb: Optional[bytes] = None) -> None:
+        """暂存一帧编码结果（共用该帧的所有片段序号）。"""
+        key = len(self.entries) * 2
+        self.store.put([key], image)
+        if thumb:
+            self.store.put([key + 1], thumb)
+        self.entries.append((indices, key, -1))
+        self.indices.update(indices)
+
+    def add_alias(self, indices: list[int], source: int) -> None:
+        """暂存复用其他投影片图片的片段（帧去重）。"""
+        self.entries.append((indices, None, source))
+        self.indices.update(indices)
+
+    def replay(self, writer) -> None:
+        """按到达顺序写入投影片写入器，写入后删除暂存的数据。"""
+        for indices, key, source in self.entries:
+            if key is None:
+                writer.add_alias(indices, source)
+            else:
+                writer.add_encoded(indices, self.store.get(key), self.store.get(key + 1))
+        self.entries.clear()
+        self.store.remove()
+
+    def remove(self) -> None:
+        """丢弃暂存的数据。"""
+        self.entries.clear()
+        self.store.remove()
+
+
 class Pipeline:
     """
     YouTube 影片处理流水线。
@@ -33,8 +89,8 @@ class Pipeline:
     3. 下载字幕 (50-60%)
     4. 解析字幕 (60-65%)
     5. 翻译字幕 (65-70%)
-    6. 提取关键帧 (70-85%)
-    7. 优化图片 (85-90%)
+    6. 提取关键帧 (74-90%)
+    7. 优化图片（与提取同步进行，帧不落盘）
     8. 生成投影片 (90-100%)
     """
 
@@ -47,6 +103,14 @@ class Pipeline:
         """
         self.job_id = job_id
         self.job_dir: Optional[Path] = None
+        # 场景检测时顺带截取的帧（以片段序号为键），提取阶段直接交付
+        self.prefetched_frames: Optional[PackedFrameStore] = None
+        # 转录期间已提前编码的投影片图片，提取阶段直接写入
+        self.prefetched_slides: Optional[_SlideBuffer] = None
+        # 转录期间是否已逐批完成翻译（完成时跳过翻译阶段）
+        self.pretranslated = False
+        # 帧缓存（任务结束时释放其存储句柄）
+        self.frame_cache: Optional[FrameCache] = None
 
     async def run(self) -> None:
         """执行完整处理流水线，自动捕获异常并更新任务状态。最长运行 4 小时。"""
@@ -60,6 +124,12 @@ class Pipeline:
         except Exception as e:
             logger.exception(f"流水线执行失败 job_id={self.job_id}: {e}")
             await self._update_status(JobStatus.FAILED, 0, error=_ANSI_RE.sub("", str(e)))
+        finally:
+            if self.frame_cache is not None:
+                self.frame_cache.close()
+            # 提取阶段之前失败时，删除转录期间暂存的投影片图片
+            if self.prefetched_slides is not None:
+                self.prefetched_slides.remove()
 
     async def _execute(self) -> None:
         """执行所有流水线阶段。"""
@@ -108,6 +178,34 @@ class Pipeline:
             logger.warning(f"job_id={self.job_id} 无字幕，将尝试 Whisper 语音转录")
             await self._update_status(JobStatus.DOWNLOADING_SUBTITLES, 60, "未找到字幕，将使用语音转录")
 
+        # 关键帧提取与编码工具：无字幕转录时即用于提前处理已转录的部分，提取阶段沿用
+        # 调试用帧另存为任务目录下的打包存储（frames.pack + frames.idx），不产生大量小文件；重新处理时清空
+        frame_store = None
+        if settings.keep_frames:
+            frame_store = PackedFrameStore(self.job_dir / "frames")
+            frame_store.remove()
+        # 帧缓存按影片 ID + 画质区分（不同画质的下载不可共用帧）
+        frame_cache = self.frame_cache = (
+            FrameCache(settings.frame_cache_path, f"{metadata.get('id') or self.job_id}_{job.video_quality}")
+            if settings.frame_cache_mb > 0 else None
+        )
+        extractor = KeyframeExtractor(
+            video_path,
+            settings.ffmpeg_path,
+            settings.ffprobe_path,
+            mode=settings.frame_extract_mode,
+            snap_tolerance=settings.frame_snap_ms / 1000,
+            frame_cache=frame_cache,
+            frame_store=frame_store,
+        )
+        optimizer = ImageOptimizer(job.image_quality, settings.image_format, settings.image_target_kb * 1024)
+        encoder = ImageEncoderPool(optimizer)
+        # 感知哈希去重：与已保留帧近似的帧不再编码，投影片直接引用已保留的图片
+        dedupe = (
+            FrameDeduplicator(settings.frame_dedupe_distance)
+            if settings.frame_dedupe_distance >= 0 else None
+        )
+
         # ── 阶段 4：解析字幕 ────────────────────────────────
         await self._update_status(JobStatus.PARSING_SUBTITLES, 62, "正在解析字幕...")
         segments = []
@@ -116,13 +214,17 @@ class Pipeline:
             segments = parser.parse(subtitle_path)
 
         if not segments:
-            segments = await self._transcribe_or_fallback(video_path, metadata)
+            segments = await self._transcribe_or_fallback(
+                video_path, metadata, job.translate_target, extractor, encoder, dedupe
+            )
 
         await self._update_status(JobStatus.PARSING_SUBTITLES, 65, f"字幕解析完成: {len(segments)} 段")
 
         # ── 阶段 5：翻译字幕 / 标点恢复 ────────────────────────────────
         await self._update_status(JobStatus.TRANSLATING, 66, "准备翻译...")
-        if job.translate_target and segments:
+        if self.pretranslated:
+            await self._update_status(JobStatus.TRANSLATING, 67, "字幕已在转录期间翻译")
+        elif job.translate_target and segments:
             translator = SubtitleTranslator(job.translate_target)
             await self._update_status(JobStatus.TRANSLATING, 67, f"翻译字幕到 {job.translate_target}...")
             segments = await translator.translate(segments)
@@ -141,65 +243,96 @@ class Pipeline:
             outline = await loop.run_in_executor(None, generator.generate, segments, metadata)
             await self._update_status(JobStatus.GENERATING_OUTLINE, 73, "大纲生成完成" if outline else "大纲生成跳过")
 
-        # ── 阶段 6：提取关键帧 ────────────────────────────────
+        # ── 阶段 6-7：提取关键帧并优化图片 ────────────────────────
+        # 帧以 RGB 原始数据从 FFmpeg 管道读入内存，经有界队列流式交给编码进程池，不写中间 JPEG
         await self._update_status(JobStatus.EXTRACTING_FRAMES, 74, "正在提取关键帧...")
-        frames_dir = self.job_dir / "frames"
-        extractor = KeyframeExtractor(video_path, frames_dir, settings.ffmpeg_path)
-
-        extracted_frames: list[Path] = []
-
-        def frame_progress(pct: int):
+        total = len(segments)
+
+        # 投影片随编码流式写出（单文件 HTML 或多文件目录）：每编码完一帧即写入，整份图片数据不在内存中驻留
+        builder = SlideBuilder(self.job_dir / "output")
+        if settings.deck_format == "multi":
+            writer = builder.open_deck_writer(segments, metadata, outline, optimizer.codec)
+        elif settings.deck_format == "packed":
+            writer = builder.open_packed_writer(segments, metadata, outline, optimizer.codec)
+        else:
+            writer = builder.open_writer(segments, metadata, outline, optimizer.codec)
+
+        extract_pct = 0
+        encoded = 0
+        last_pct = -1
+        progress_lock = threading.Lock()
+
+        def report_frames() -> None:
+            # 总进度 = 提取与编码进度各占一半；可能在提取线程或事件循环中调用
+            nonlocal last_pct
+            with progress_lock:
+                pct = (extract_pct + int(encoded / max(total, 1) * 100)) // 2
+                if pct == last_pct:
+                    return
+                last_pct = pct
             asyncio.run_coroutine_threadsafe(
                 self._update_status(
                     JobStatus.EXTRACTING_FRAMES,
-                    72 + int(pct * 0.13),
-                    f"提取帧中... {pct}%",
+                    74 + int(pct * 0.16),
+                    f"提取并优化关键帧... {pct}%（已编码 {encoded}/{total}）",
                 ),
                 loop,
             )
 
-        extracted_frames = await extractor.extract(segments, frame_progress)
-        await self._update_status(JobStatus.EXTRACTING_FRAMES, 85, f"关键帧提取完成: {len(extracted_frames)} 帧")
+        def extract_progress(pct: int) -> None:
+            nonlocal extract_pct
+            extract_pct = pct
+            report_frames()
 
-        # ── 阶段 7：优化图片 ────────────────────────────────
-        await self._update_status(JobStatus.OPTIMIZING_IMAGES, 87, "正在优化图片...")
-        optimizer = ImageOptimizer(job.image_quality)
-        total = len(extracted_frames)
-        loop = asyncio.get_event_loop()
-        CONCURRENCY = 8  # 同时处理的帧数
-
-        frame_base64_list = [None] * total
-        thumb_base64_list = [None] * total
-        completed = 0
-
-        for batch_start in range(0, total, CONCURRENCY):
-            batch = extracted_frames[batch_start: batch_start + CONCURRENCY]
-            # 主图和缩略图并行生成
-            main_results = await asyncio.gather(*[
-                loop.run_in_executor(None, optimizer.optimize_to_base64, fp)
-                for fp in batch
-            ])
-            thumb_results = await asyncio.gather(*[
-                loop.run_in_executor(None, optimizer.thumbnail_to_base64, fp)
-                for fp in batch
-            ])
-            for i, (b64, thumb) in enumerate(zip(main_results, thumb_results)):
-                frame_base64_list[batch_start + i] = b64
-                thumb_base64_list[batch_start + i] = thumb
-            completed += len(batch)
-            pct = int(completed / max(total, 1) * 100)
-            await self._update_status(
-                JobStatus.OPTIMIZING_IMAGES,
-                87 + int(pct * 0.03),
-                f"优化图片中... {pct}%",
+        def on_encoded(count: int) -> None:
+            nonlocal encoded
+            encoded += count
+            report_frames()
+
+        try:
+            # 转录期间已提前编码的投影片直接写入，只提取其余片段
+            skip = None
+            if self.prefetched_slides is not None:
+                await loop.run_in_executor(None, self.prefetched_slides.replay, writer)
+                on_encoded(len(self.prefetched_slides.indices))
+                skip = self.prefetched_slides.indices
+            await self._encode_frames(
+                extractor,
+                encoder,
+                dedupe,
+                segments,
+                writer,
+                extract_progress=extract_progress,
+                on_encoded=on_encoded,
+                prefetched=self.prefetched_frames,
+                skip=skip,
+            )
+        except BaseException:
+            writer.discard()
+            raise
+        finally:
+            if self.prefetched_slides is not None:
+                self.prefetched_slides.remove()
+                self.prefetched_slides = None
+            if frame_store is not None:
+                frame_store.close()
+            if self.prefetched_frames is not None:
+                self.prefetched_frames.remove()
+        if frame_cache:
+            frame_cache.close()
+            await loop.run_in_executor(
+                None, prune_frame_cache, settings.frame_cache_path, settings.frame_cache_mb * 1024 * 1024
             )
-        await self._update_status(JobStatus.OPTIMIZING_IMAGES, 90, "图片优化完成")
+        duplicates = dedupe.duplicates if dedupe else 0
+        if duplicates:
+            logger.info(f"帧去重：{duplicates}/{total} 张投影片复用已有图片")
+        await self._update_status(
+            JobStatus.OPTIMIZING_IMAGES, 90, f"图片优化完成: {total} 帧（去重复用 {duplicates} 帧）"
+        )
 
         # ── 阶段 8：生成投影片 ────────────────────────────────
         await self._update_status(JobStatus.BUILDING_SLIDES, 92, "正在生成投影片...")
-        output_dir = self.job_dir / "output"
-        builder = SlideBuilder(output_dir)
-        output_path = builder.build(segments, frame_base64_list, metadata, thumb_base64_list, outline)
+        output_path = await loop.run_in_executor(None, writer.close)
 
         # 完成
         with Session(engine) as session:
@@ -274,13 +407,141 @@ class Pipeline:
         with Session(engine) as session:
             return session.get(Job, self.job_id)
 
-    async def _transcribe_or_fallback(self, video_path: Path, metadata: dict):
+    async def _encode_frames(
+        self,
+        extractor: KeyframeExtractor,
+        encoder: ImageEncoderPool,
+        dedupe: Optional[FrameDeduplicator],
+        segments: list,
+        sink,
+        extract_progress: Optional[Callable[[int], None]] = None,
+        on_encoded: Optional[Callable[[int], None]] = None,
+        **extract_kwargs,
+    ) -> None:
+        """
+        提取关键帧并编码，结果交给 sink（投影片写入器或 _SlideBuffer 的 add_encoded / add_alias）。
+
+        提取与编码通过有界队列串联：提取出一帧即编码一帧，总耗时接近较慢的一侧；
+        与已保留帧重复的帧不再编码，直接登记为引用。写入 sink（含精灵图拼接）由单一任务依序在线程池中执行，
+        不占用事件循环。任一环节失败立即中止全部环节并抛出。
+
+        参数：
+            extractor: 关键帧提取器
+            encoder: 编码进程池
+            dedupe: 帧去重器（None 表示不去重）
+            segments: 待提取的字幕片段
+            sink: 编码结果的接收方
+            extract_progress: 提取进度回调，接受 0-100 整数
+            on_encoded: 每完成若干张投影片时回调，参数为张数
+            extract_kwargs: 透传给 extract_images 的参数（prefetched、skip、first_index）
         """
-        无字幕时，优先用 Whisper 语音转录；失败则降级为每 30 秒截一帧。
+        loop = asyncio.get_event_loop()
+        frame_queue: asyncio.Queue = asyncio.Queue(maxsize=encoder.workers * 2)
+        write_queue: asyncio.Queue = asyncio.Queue()
+        aborted = threading.Event()
+        # 进行中的去重登记数：中止后等其归零，返回后不再有新帧登记，调用方可据此撤销未写出的帧
+        matching = threading.Condition()
+        in_match = 0
+
+        def match(indices: list[int], image) -> Optional[int]:
+            nonlocal in_match
+            with matching:
+                if aborted.is_set():
+                    raise RuntimeError("流水线已中止")
+                in_match += 1
+            try:
+                return dedupe.match(indices, image)
+            finally:
+                with matching:
+                    in_match -= 1
+                    matching.notify_all()
+
+        def on_image(indices: list[int], image) -> None:
+            # 在提取线程中运行：重复帧直接登记引用；其余放入有界队列，队列满时阻塞提取（背压）
+            source = match(indices, image) if dedupe else None
+            if source is not None:
+                loop.call_soon_threadsafe(write_queue.put_nowait, (sink.add_alias, indices, source))
+                return
+            future = asyncio.run_coroutine_threadsafe(frame_queue.put((indices, image)), loop)
+            while True:
+                try:
+                    future.result(timeout=1)
+                    return
+                except concurrent.futures.TimeoutError:
+                    if aborted.is_set():
+                        future.cancel()
+                        raise RuntimeError("流水线已中止")
+
+        async def consume() -> None:
+            while True:
+                item = await frame_queue.get()
+                if item is None:
+                    return
+                indices, image = item
+                main, thumb = await encoder.encode(image)
+                write_queue.put_nowait((sink.add_encoded, indices, main, thumb))
+
+        async def write() -> None:
+            # 写入器不是线程安全的：逐项等待完成，保证同一时刻只有一个线程在写
+            while True:
+                item = await write_queue.get()
+                if item is None:
+                    return
+                method, indices, *args = item
+                await loop.run_in_executor(None, method, indices, *args)
+                if on_encoded:
+                    on_encoded(len(indices))
+
+        async def produce() -> None:
+            await extractor.extract_images(
+                segments,
+                on_image,
+                extract_progress,
+                max_size=(ImageOptimizer.MAX_WIDTH, ImageOptimizer.MAX_HEIGHT),
+                **extract_kwargs,
+            )
+            for _ in consumers:
+                await frame_queue.put(None)
+            await asyncio.gather(*consumers)
+            write_queue.put_nowait(None)
+
+        consumers = [asyncio.create_task(consume()) for _ in range(encoder.workers)]
+        tasks = [asyncio.create_task(produce()), asyncio.create_task(write()), *consumers]
+        try:
+            # 任一环节失败立即中止：否则提取线程会一直等待已退出的消费者腾出队列，占住共用的提取线程池
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+        finally:
+            with matching:
+                aborted.set()
+                matching.wait_for(lambda: in_match == 0)
+            for task in tasks:
+                task.cancel()
+
+    async def _transcribe_or_fallback(
+        self,
+        video_path: Path,
+        metadata: dict,
+        translate_target: str,
+        extractor: KeyframeExtractor,
+        encoder: ImageEncoderPool,
+        dedupe: Optional[FrameDeduplicator],
+    ):
+        """
+        无字幕时，优先用 Whisper 语音转录；失败则降级为场景检测分段（再失败时每 30 秒截一帧）。
+
+        转录结果按窗口陆续到达：后台随即提取并编码已转录片段的关键帧（编码结果暂存于 _SlideBuffer，
+        提取阶段直接写入投影片）并翻译，后续窗口仍在转录时前面的内容已处理完毕。
 
         参数：
             video_path: 影片文件路径
             metadata: 影片元数据
+            translate_target: 翻译目标语言（空表示不翻译）
+            extractor: 关键帧提取器（与提取阶段共用）
+            encoder: 编码进程池
+            dedupe: 帧去重器（与提取阶段共用；转录失败时清空）
 
         返回：
             SubtitleSegment 列表
@@ -300,20 +561,147 @@ class Pipeline:
                 loop,
             )
 
+        buffer = _SlideBuffer(self.job_dir / "prefetched")
+        translator = (
+            SubtitleTranslator(translate_target)
+            if translate_target and settings.openrouter_api_key else None
+        )
+        pending: asyncio.Queue = asyncio.Queue()
+
+        async def encode(batch: list, first_index: int) -> None:
+            try:
+                await self._encode_frames(extractor, encoder, dedupe, batch, buffer, first_index=first_index)
+            except Exception as e:
+                # 未完成的片段在提取阶段重新提取；撤销其已登记但未写出的帧，否则重新提取时会被判为与自身重复
+                logger.warning(f"提前提取关键帧失败（片段 {first_index} 起）: {e}")
+                if dedupe:
+                    dedupe.forget(set(range(first_index, first_index + len(batch))) - buffer.indices)
+
+        worker = asyncio.create_task(self._prefetch_slides(pending, encode, translator))
+        segments = []
         try:
             transcriber = WhisperTranscriber(
                 model_name=settings.whisper_model,
                 ffmpeg_path=settings.ffmpeg_path,
             )
-            segments = await transcriber.transcribe(video_path, transcribe_progress)
+            async for seg in transcriber.iter_segments(
+                video_path, transcribe_progress, duration=float(metadata.get("duration") or 0)
+            ):
+                segments.append(seg)
+                pending.put_nowait(seg)
+            pending.put_nowait(None)
+            await worker
             if segments:
-                logger.info(f"Whisper 转录成功: {len(segments)} 个片段")
+                logger.info(f"Whisper 转录成功: {len(segments)} 个片段（已提前编码 {len(buffer.indices)} 张）")
+                self.prefetched_slides = buffer
+                self.pretranslated = translator is not None
                 return segments
             logger.warning("Whisper 转录结果为空，降级为场景截帧")
         except Exception as e:
             logger.exception(f"Whisper 转录失败，降级为场景截帧: {e}")
+        finally:
+            worker.cancel()
+
+        # 已登记的帧与暂存的图片对应作废的片段序号
+        buffer.remove()
+        if dedupe:
+            dedupe.clear()
+        segments = await self._detect_scene_segments(video_path, metadata)
+        return segments or self._generate_scene_segments(metadata)
+
+    @staticmethod
+    async def _prefetch_slides(
+        pending: asyncio.Queue,
+        encode: Callable[[list, int], Awaitable[None]],
+        translator: Optional[SubtitleTranslator],
+    ) -> None:
+        """
+        转录期间的后台处理：每次取走已到达的全部片段，提取并编码其关键帧，同时翻译。
+
+        转录按窗口产出，窗口内的片段连续到达，因此每批通常是一个完整窗口（处理较慢时合并多个窗口）。
+
+        参数：
+            pending: 已转录片段的队列，None 表示转录结束
+            encode: 提取并编码一批片段的协程函数，接收 (片段列表, 首个片段序号)
+            translator: 翻译器（None 表示不翻译）
+        """
+        first_index = 0
+        finished = False
+        while not finished:
+            batch = [await pending.get()]
+            while not pending.empty():
+                batch.append(pending.get_nowait())
+            if batch[-1] is None:
+                finished = True
+                batch.pop()
+            if not batch:
+                continue
+            jobs = [encode(batch, first_index)]
+            if translator:
+                jobs.append(translator.translate(batch))
+            await asyncio.gather(*jobs)
+            first_index += len(batch)
+
+    async def _detect_scene_segments(self, video_path: Path, metadata: dict):
+        """
+        降级方案：单次解码检测场景切换，按场景分段，并顺带截取每个场景的第一帧供提取阶段直接使用。
 
-        return self._generate_scene_segments(metadata)
+        参数：
+            video_path: 影片文件路径
+            metadata: 影片元数据
+
+        返回：
+            SubtitleSegment 列表，检测失败或关闭时返回空列表
+        """
+        from app.services.subtitle import SubtitleSegment
+
+        if settings.scene_threshold <= 0:
+            return []
+        await self._update_status(JobStatus.PARSING_SUBTITLES, 64, "正在检测场景切换...")
+        loop = asyncio.get_event_loop()
+        duration = float(metadata.get("duration") or 0)
+
+        def scene_progress(pct: int):
+            asyncio.run_coroutine_threadsafe(
+                self._update_status(JobStatus.PARSING_SUBTITLES, 64, f"检测场景切换中... {pct}%"),
+                loop,
+            )
+
+        store = PackedFrameStore(self.job_dir / "scenes")
+        store.remove()
+        extractor = KeyframeExtractor(video_path, settings.ffmpeg_path, settings.ffprobe_path)
+        try:
+            cuts = await loop.run_in_executor(
+                None,
+                lambda: extractor.detect_scenes(
+                    settings.scene_threshold,
+                    store,
+                    max_size=(ImageOptimizer.MAX_WIDTH, ImageOptimizer.MAX_HEIGHT),
+                    duration=duration,
+                    progress_callback=scene_progress,
+                ),
+            )
+        except Exception as e:
+            logger.exception(f"场景检测失败: {e}")
+            cuts = []
+        if not cuts:
+            store.remove()
+            return []
+
+        # 第一个场景从 0 开始；最后一个场景延续到影片结尾
+        cuts[0] = 0.0
+        ends = cuts[1:] + [max(duration, cuts[-1] + 1.0)]
+        segments = [
+            SubtitleSegment(
+                start=start,
+                end=end,
+                text=f"[{self._format_time(start)} - {self._format_time(end)}]",
+            )
+            for start, end in zip(cuts, ends)
+        ]
+        self.prefetched_frames = store
+        logger.info(f"无字幕且转录失败，按场景切换生成 {len(segments)} 个片段")
+        return segments
 
     def _generate_scene_segments(self, metadata: dict):
         """
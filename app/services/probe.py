@@ -0,0 +1,215 @@
+"""影片探测服务：使用 ffprobe 建立并缓存关键帧（I 帧）索引，供帧提取吸附到关键帧快速 seek。"""
+
+import bisect
+import json
+import subprocess
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+from loguru import logger
+
+# 读取关键帧索引时按影片路径加锁，避免并发任务重复扫描同一文件
+_index_locks: dict[Path, threading.Lock] = {}
+_index_locks_guard = threading.Lock()
+
+
+class VideoProbe:
+    """影片探测器：关键帧时间索引（内存与磁盘两级缓存）。"""
+
+    # 磁盘缓存文件后缀，与影片文件放在同一目录
+    INDEX_SUFFIX = ".keyframes.json"
+
+    def __init__(self, video_path: Path, ffprobe_path: str = "ffprobe"):
+        """
+        初始化影片探测器。
+
+        参数：
+            video_path: 影片文件路径
+            ffprobe_path: ffprobe 可执行文件路径
+        """
+        self.video_path = video_path
+        self.ffprobe_path = ffprobe_path
+
+    @property
+    def index_path(self) -> Path:
+        """关键帧索引的磁盘缓存路径。"""
+        return self.video_path.with_name(self.video_path.name + self.INDEX_SUFFIX)
+
+    def keyframes(self) -> list[float]:
+        """
+        返回影片关键帧的时间戳列表（秒，升序；同步，扫描时在线程池中调用）。
+
+        以影片的修改时间与大小为缓存键：进程内缓存命中直接返回，
+        否则读取磁盘缓存，都失效时用 ffprobe 扫描数据包标志重建（只解封装，不解码）。
+
+        返回：
+            关键帧时间戳列表，探测失败时为空列表
+        """
+        try:
+            stat = self.video_path.stat()
+        except OSError as e:
+            logger.warning(f"读取影片信息失败: {e}")
+            return []
+        with _index_locks_guard:
+            lock = _index_locks.setdefault(self.video_path, threading.Lock())
+        with lock:
+            return _cached_keyframes(self.video_path, self.ffprobe_path, stat.st_mtime_ns, stat.st_size)
+
+    def snap(self, timestamps: list[float], tolerance: float) -> list[Optional[float]]:
+        """
+        将每个时间戳吸附到容差内最近的关键帧。
+
+        参数：
+            timestamps: 目标时间列表（秒）
+            tolerance: 允许的最大偏差（秒）
+
+        返回：
+            与 timestamps 一一对应的关键帧时间戳，容差内没有关键帧时为 None
+        """
+        keyframes = self.keyframes()
+        return [_nearest(keyframes, ts, tolerance) for ts in timestamps]
+
+    def _load_index(self, mtime_ns: int, size: int) -> Optional[list[float]]:
+        """读取磁盘缓存的关键帧索引，影片已变化或文件损坏时返回 None。"""
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if data.get("mtime_ns") != mtime_ns or data.get("size") != size:
+            return None
+        return data.get("keyframes")
+
+    def _save_index(self, keyframes: list[float], mtime_ns: int, size: int) -> None:
+        """写入关键帧索引的磁盘缓存（失败不影响提取）。"""
+        tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        try:
+            tmp_path.write_text(
+                json.dumps({"mtime_ns": mtime_ns, "size": size, "keyframes": keyframes}),
+                encoding="utf-8",
+            )
+            tmp_path.replace(self.index_path)
+        except OSError as e:
+            logger.warning(f"写入关键帧索引失败: {e}")
+
+    def _scan_keyframes(self) -> list[float]:
+        """用 ffprobe 读取视频流全部数据包的时间与标志，筛选关键帧（K 标志）。"""
+        cmd = [
+            self.ffprobe_path,
+            "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags",
+            "-of", "csv=p=0",
+            str(self.video_path),
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+        except Exception as e:
+            logger.warning(f"扫描关键帧失败: {e}")
+            return []
+        if result.returncode != 0:
+            logger.warning(f"扫描关键帧失败: {result.stderr[-500:]}")
+            return []
+        keyframes = set()
+        for line in result.stdout.splitlines():
+            pts_time, _, flags = line.partition(",")
+            if "K" not in flags:
+                continue
+            try:
+                keyframes.add(float(pts_time))
+            except ValueError:
+                continue
+        return sorted(keyframes)
+
+
+@lru_cache(maxsize=32)
+def _cached_keyframes(video_path: Path, ffprobe_path: str, mtime_ns: int, size: int) -> list[float]:
+    """进程内缓存的关键帧索引；以修改时间与大小为键，影片重新下载后自动失效。"""
+    probe = VideoProbe(video_path, ffprobe_path)
+    keyframes = probe._load_index(mtime_ns, size)
+    if keyframes is None:
+        keyframes = probe._scan_keyframes()
+        if keyframes:
+            probe._save_index(keyframes, mtime_ns, size)
+        logger.info(f"关键帧索引: {video_path.name} 共 {len(keyframes)} 个关键帧")
+    return keyframes
+
+
+def _nearest(keyframes: list[float], timestamp: float, tolerance: float) -> Optional[float]:
+    """在升序关键帧列表中二分查找容差内最近的关键帧。"""
+    pos = bisect.bisect_left(keyframes, timestamp)
+    best = None
+    for cand in (pos - 1, pos):
+        if 0 <= cand < len(keyframes) and abs(keyframes[cand] - timestamp) <= tolerance:
+            if best is None or abs(keyframes[cand] - timestamp) < abs(best - timestamp):
+                best = keyframes[cand]
+    return best
+
+
+async def benchmark_extraction(
+    video_path: Path,
+    count: int = 50,
+    tolerance_ms: int = 1000,
+    mode: str = "per_frame",
+) -> dict:
+    """
+    对比精确取帧与关键帧吸附取帧的耗时（均为内存模式，不写文件）。
+
+    时间点在影片时长内均匀分布；关键帧索引在计时前建立，不计入吸附模式耗时。
+
+    参数：
+        video_path: 影片文件路径
+        count: 取帧数量
+        tolerance_ms: 吸附容差（毫秒）
+        mode: 精确取帧使用的提取模式（per_frame / single_pass / parallel）
+
+    返回：
+        {"exact": 秒, "snapped": 秒, "snapped_count": 吸附成功的帧数}
+    """
+    import time
+
+    from app.config import settings
+    from app.services.extractor import KeyframeExtractor
+    from app.services.subtitle import SubtitleSegment
+
+    probe = VideoProbe(video_path, settings.ffprobe_path)
+    keyframes = probe.keyframes()
+    duration = keyframes[-1] if keyframes else 0.0
+    if duration <= 0:
+        raise ValueError(f"无法读取关键帧索引: {video_path}")
+    step = duration / count
+    segments = [SubtitleSegment(start=i * step, end=(i + 1) * step, text="") for i in range(count)]
+    tolerance = tolerance_ms / 1000
+    snapped_count = sum(
+        1 for kf in probe.snap([(seg.start + seg.end) / 2 for seg in segments], tolerance) if kf is not None
+    )
+
+    timings = {}
+    for name, snap in (("exact", 0.0), ("snapped", tolerance)):
+        extractor = KeyframeExtractor(
+            video_path, settings.ffmpeg_path, settings.ffprobe_path, mode=mode, snap_tolerance=snap
+        )
+        started = time.perf_counter()
+        await extractor.extract_images(segments, lambda indices, image: None)
+        timings[name] = time.perf_counter() - started
+    return {**timings, "snapped_count": snapped_count}
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="对比精确取帧与关键帧吸附取帧的耗时")
+    parser.add_argument("video", type=Path, help="影片文件路径")
+    parser.add_argument("--count", type=int, default=50, help="取帧数量")
+    parser.add_argument("--tolerance-ms", type=int, default=1000, help="吸附容差（毫秒）")
+    parser.add_argument("--mode", default="per_frame", help="精确取帧的提取模式")
+    args = parser.parse_args()
+
+    result = asyncio.run(benchmark_extraction(args.video, args.count, args.tolerance_ms, args.mode))
+    print(
+        f"精确取帧: {result['exact']:.2f}s\n"
+        f"关键帧吸附: {result['snapped']:.2f}s（{result['snapped_count']}/{args.count} 帧吸附，"
+        f"其余精确取帧）\n"
+        f"加速比: {result['exact'] / max(result['snapped'], 1e-9):.1f}x"
+    )
@@ -1,16 +1,282 @@
-"""投影片生成服务：将帧图片与字幕组合为自包含 HTML 文件。"""
+"""投影片生成服务：将帧图片与字幕组合为自包含 HTML 文件，或 HTML 外壳 + 清单 + 图片目录的多文件投影片。"""
 
+import base64
+import hashlib
 import json
+import re
+import shutil
+import unicodedata
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 from loguru import logger
 
+from app.services.optimizer import IMAGE_CODECS, PIL_AVAILABLE, ImageCodec, SpriteSheetPacker
 from app.services.subtitle import SubtitleSegment
 
+# 不以空格分词的文字（泰文、老挝文、缅甸文、高棉文、中日韩），连续段切为单字与二元组
+_SEARCH_NGRAM_CHARS = r"\u0e00-\u0eff\u1000-\u109f\u1780-\u17ff\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af"
+
+# 搜索分词：任意文字的字母/数字（[^\W_] 即 JS 的 [\p{L}\p{N}]）按词切分，_SEARCH_NGRAM_CHARS 连续段另行切分
+_SEARCH_TOKEN_RE = re.compile(
+    rf"((?:(?![{_SEARCH_NGRAM_CHARS}])[^\W_])+)|([{_SEARCH_NGRAM_CHARS}]+)"
+)
+
+# 查看器虚拟列表（侧边栏与全部模式共用）
+_VIRTUAL_LIST_JS = r"""
+// 虚拟列表：只渲染可视区域附近的行，滚出的元素回收复用；行高实测后按投影片序号缓存
+class VirtualList {
+  constructor(container, size, { create, render, gap = 0, estimate = 100, overscan = 600 }) {
+    this.container = container;
+    this.create = create;
+    this.renderRow = render;
+    this.gap = gap;
+    this.estimate = estimate;
+    this.overscan = overscan;
+    this.heights = new Float32Array(size);
+    this.rowOf = new Int32Array(size).fill(-1);
+    this.items = [];
+    this.offsets = new Float64Array(1);
+    this.rows = new Map();
+    this.pool = [];
+    this.calibrated = false;
+    this.spacer = document.createElement('div');
+    this.spacer.className = 'vlist-spacer';
+    container.appendChild(this.spacer);
+
+    let scheduled = false;
+    this.schedule = () => {
+      if (scheduled) return;
+      scheduled = true;
+      requestAnimationFrame(() => { scheduled = false; this.render(); });
+    };
+    container.addEventListener('scroll', this.schedule, { passive: true });
+    window.addEventListener('resize', () => { this.measure([...this.rows.keys()]); this.schedule(); });
+  }
+
+  heightOf(idx) {
+    return this.heights[idx] || this.estimate;
+  }
+
+  // 替换数据源（搜索过滤后调用）
+  setItems(items) {
+    this.items = items;
+    this.rowOf.fill(-1);
+    items.forEach((idx, pos) => { this.rowOf[idx] = pos; });
+    this.rows.forEach(el => this.release(el));
+    this.rows.clear();
+    this.layout();
+    this.render();
+  }
+
+  layout() {
+    const n = this.items.length;
+    this.offsets = new Float64Array(n + 1);
+    for (let pos = 0; pos < n; pos++) {
+      this.offsets[pos + 1] = this.offsets[pos] + this.heightOf(this.items[pos]) + this.gap;
+    }
+    this.spacer.style.height = Math.max(0, this.offsets[n] - this.gap) + 'px';
+  }
+
+  // 返回底边位于 y 之下的第一行
+  rowAt(y) {
+    let lo = 0, hi = this.items.length;
+    while (lo < hi) {
+      const mid = (lo + hi) >> 1;
+      if (this.offsets[mid + 1] <= y) lo = mid + 1; else hi = mid;
+    }
+    return lo;
+  }
+
+  render() {
+    const height = this.container.clientHeight;
+    if (!height) return;  // 容器隐藏时不渲染
+    const top = this.container.scrollTop - this.spacer.offsetTop;
+    const first = this.rowAt(top - this.overscan);
+    const last = Math.min(this.items.length, this.rowAt(top + height + this.overscan) + 1);
+
+    for (const [pos, el] of this.rows) {
+      if (pos < first || pos >= last) {
+        this.release(el);
+        this.rows.delete(pos);
+      }
+    }
+    const fresh = [];
+    for (let pos = first; pos < last; pos++) {
+      if (this.rows.has(pos)) continue;
+      let el = this.pool.pop();
+      if (!el) {
+        el = this.create();
+        el.classList.add('vlist-row');
+        this.spacer.appendChild(el);
+      }
+      el.style.display = '';
+      this.rows.set(pos, el);
+      this.renderRow(el, this.items[pos]);
+      fresh.push(pos);
+    }
+    this.place();
+    this.measure(fresh);
+  }
+
+  release(el) {
+    el.style.display = 'none';
+    el.removeAttribute('id');
+    this.pool.push(el);
+  }
+
+  place() {
+    for (const [pos, el] of this.rows) el.style.transform = `translateY(${this.offsets[pos]}px)`;
+  }
+
+  // 实测行高；首批测量校准未测行的估计值，视口上方的行高变化时同步修正滚动位置
+  measure(positions) {
+    if (!positions.length) return;
+    if (!this.calibrated) {
+      let sum = 0, count = 0;
+      for (const pos of positions) {
+        const h = this.rows.get(pos).offsetHeight;
+        if (h) { sum += h; count++; }
+      }
+      if (!count) return;
+      this.estimate = sum / count;
+      this.calibrated = true;
+    }
+    const top = this.container.scrollTop - this.spacer.offsetTop;
+    let changed = false;
+    let shift = 0;
+    for (const pos of positions) {
+      const idx = this.items[pos];
+      const h = this.rows.get(pos).offsetHeight;
+      if (!h) continue;
+      const old = this.heightOf(idx);
+      this.heights[idx] = h;
+      if (Math.abs(h - old) < 1) continue;
+      changed = true;
+      if (this.offsets[pos + 1] <= top) shift += h - old;
+    }
+    if (!changed) return;
+    this.layout();
+    this.place();
+    if (shift) this.container.scrollTop += shift;
+    this.schedule();
+  }
+
+  // 重绘某张投影片所在的行（若已渲染）
+  refresh(idx) {
+    const el = this.rows.get(this.rowOf[idx]);
+    if (!el) return;
+    this.renderRow(el, idx);
+    this.measure([this.rowOf[idx]]);
+  }
+
+  refreshAll() {
+    for (const [pos, el] of this.rows) this.renderRow(el, this.items[pos]);
+    this.measure([...this.rows.keys()]);
+  }
+
+  // 滚动到使该投影片可见的最近位置
+  scrollTo(idx) {
+    const pos = this.rowOf[idx];
+    const view = this.container;
+    if (pos < 0 || !view.clientHeight) return;
+    const top = this.spacer.offsetTop + this.offsets[pos];
+    const bottom = this.spacer.offsetTop + this.offsets[pos + 1] - this.gap;
+    if (top < view.scrollTop) view.scrollTop = top;
+    else if (bottom > view.scrollTop + view.clientHeight) view.scrollTop = bottom - view.clientHeight;
+    this.render();
+  }
+}
+"""
+
+# 搜索 Web Worker：加载倒排索引并响应查询（分词规则须与 _SEARCH_TOKEN_RE 一致）
+_SEARCH_WORKER_JS = r"""
+const NGRAM = '\\u0e00-\\u0eff\\u1000-\\u109f\\u1780-\\u17ff\\u3040-\\u30ff\\u3400-\\u4dbf\\u4e00-\\u9fff\\uac00-\\ud7af';
+const TOKEN_RE = new RegExp(`((?:(?![${NGRAM}])[\\p{L}\\p{N}])+)|([${NGRAM}]+)`, 'gu');
+let terms = [];
+let postings = [];
+let texts = [];
+let ready = null;
+
+function decode(deltas) {
+  let id = 0;
+  return deltas.map(d => (id += d));
+}
+
+function lowerBound(term) {
+  let lo = 0, hi = terms.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (terms[mid] < term) lo = mid + 1; else hi = mid;
+  }
+  return lo;
+}
+
+// 词按前缀匹配（输入中途即可命中），单字/二元组精确匹配
+function lookup(term, prefix) {
+  const out = new Set();
+  for (let i = lowerBound(term); i < terms.length; i++) {
+    if (prefix ? !terms[i].startsWith(term) : terms[i] !== term) break;
+    postings[i].forEach(id => out.add(id));
+  }
+  return out;
+}
+
+function search(query) {
+  const q = query.normalize('NFC').toLowerCase();
+  let result = null;
+  for (const m of q.matchAll(TOKEN_RE)) {
+    const sets = [];
+    if (m[1]) {
+      sets.push(lookup(m[1], true));
+    } else if (m[2].length === 1) {
+      sets.push(lookup(m[2], false));
+    } else {
+      for (let i = 0; i < m[2].length - 1; i++) sets.push(lookup(m[2].slice(i, i + 2), false));
+    }
+    for (const set of sets) {
+      result = result ? new Set([...result].filter(id => set.has(id))) : set;
+    }
+  }
+  if (result === null) {
+    // 不含词项的查询（如纯符号）：逐张做子串匹配
+    const needle = q.trim();
+    result = new Set();
+    texts.forEach((text, id) => { if (text.includes(needle)) result.add(id); });
+  }
+  return result;
+}
+
+self.onmessage = e => {
+  const msg = e.data;
+  if (msg.type === 'load') {
+    const data = msg.url ? fetch(msg.url).then(r => r.json()) : Promise.resolve(JSON.parse(msg.json));
+    ready = data.then(index => {
+      terms = index.terms;
+      postings = index.postings.map(decode);
+      texts = index.texts || [];
+    });
+  } else if (msg.type === 'query') {
+    ready.then(() => {
+      self.postMessage({ seq: msg.seq, ids: Array.from(search(msg.q)) });
+    });
+  }
+};
+"""
+
 
 class SlideBuilder:
     """生成自包含 HTML 投影片，支持键盘导航与缩略图。"""
 
+    # 多文件投影片的文件布局
+    DECK_SHELL = "index.html"
+    DECK_MANIFEST = "slides.json"
+    DECK_IMAGES = "images"
+    DECK_SEARCH = "search.json"
+
+    # 分页加载时每页的投影片数（外壳内联第一页，其余由浏览器按需请求）
+    PAGE_SIZE = 100
+
     def __init__(self, output_dir: Path):
         """
         初始化投影片生成器。
@@ -41,44 +307,249 @@ class SlideBuilder:
         返回：
             生成的 HTML 文件路径
         """
-        slides = []
-        for idx, (seg, img_data) in enumerate(zip(segments, frame_base64_list)):
-            thumb = thumb_base64_list[idx] if thumb_base64_list and idx < len(thumb_base64_list) else img_data
-            slide = {
-                "id": idx,
-                "start": seg.start,
-                "end": seg.end,
-                "text": seg.text,
-                "translation": seg.translation,
-                "image": img_data,
-                "thumb": thumb,
-                "timestamp": self._format_time(seg.start),
-            }
-            slides.append(slide)
+        writer = self.open_writer(segments, metadata, outline)
+        for idx, img_data in enumerate(frame_base64_list[: len(segments)]):
+            thumb = thumb_base64_list[idx] if thumb_base64_list and idx < len(thumb_base64_list) else None
+            writer.add(idx, img_data, thumb)
+        return writer.close()
+
+    def open_writer(
+        self,
+        segments: list[SubtitleSegment],
+        metadata: dict,
+        outline: Optional[str] = None,
+        codec: Optional[ImageCodec] = None,
+    ) -> "SlideStreamWriter":
+        """
+        打开流式写出器：图片编码完成一张即写入一张，整份投影片数据不在内存中驻留。
+
+        参数：
+            segments: 字幕片段列表
+            metadata: 影片元数据
+            outline: AI 大纲 Markdown
+            codec: 图片编码格式（默认 JPEG）
+
+        返回：
+            SlideStreamWriter，依次调用 add() 与 close()
+        """
+        return SlideStreamWriter(
+            self, self.output_dir / "slides.html", segments, self._resolve_title(metadata), metadata, outline, codec
+        )
+
+    def open_packed_writer(
+        self,
+        segments: list[SubtitleSegment],
+        metadata: dict,
+        outline: Optional[str] = None,
+        codec: Optional[ImageCodec] = None,
+    ) -> "PackedSlideWriter":
+        """
+        打开图片打包的单文件写出器：所有图片打包为一个二进制块（附偏移表）嵌入 HTML，
+        查看器只在图片即将显示时解码为 Blob URL，避免加载时解析数千个大字符串字面量。
+
+        参数：
+            segments: 字幕片段列表
+            metadata: 影片元数据
+            outline: AI 大纲 Markdown
+            codec: 图片编码格式（默认 JPEG）
+
+        返回：
+            PackedSlideWriter，依次调用 add_encoded() 与 close()
+        """
+        return PackedSlideWriter(
+            self, self.output_dir / "slides.html", segments, self._resolve_title(metadata), metadata, outline, codec
+        )
+
+    def open_deck_writer(
+        self,
+        segments: list[SubtitleSegment],
+        metadata: dict,
+        outline: Optional[str] = None,
+        codec: Optional[ImageCodec] = None,
+    ) -> "DeckWriter":
+        """
+        打开多文件投影片写出器：图片以二进制文件写入 images/，清单写入 slides.json，
+        外壳 index.html 由浏览器按需加载清单与图片。
+
+        参数：
+            segments: 字幕片段列表
+            metadata: 影片元数据
+            outline: AI 大纲 Markdown
+            codec: 图片编码格式（默认 JPEG）
+
+        返回：
+            DeckWriter，依次调用 add_encoded() 与 close()
+        """
+        return DeckWriter(self, segments, self._resolve_title(metadata), metadata, outline, codec)
+
+    def bundle_deck(self) -> Path:
+        """
+        将多文件投影片打包为自包含单文件 HTML（slides.html），供下载离线查看。
+
+        逐张读取图片并流式写出，内存占用与投影片数量无关；共用同一图片文件的投影片（帧去重）
+        只内联一次，其余登记为引用。
+
+        返回：
+            生成的 HTML 文件路径
+        """
+        manifest = json.loads((self.output_dir / self.DECK_MANIFEST).read_text(encoding="utf-8"))
+        segments = [
+            SubtitleSegment(
+                start=slide["start"],
+                end=slide["end"],
+                text=slide["text"],
+                translation=slide.get("translation"),
+            )
+            for slide in manifest["slides"]
+        ]
+        writer = SlideStreamWriter(
+            self,
+            self.output_dir / "slides.html",
+            segments,
+            manifest.get("title", ""),
+            manifest.get("metadata", {}),
+            manifest.get("outline"),
+        )
+        owners: dict[str, int] = {}
+        try:
+            for idx, slide in enumerate(manifest["slides"]):
+                image = slide.get("image")
+                if image in owners:
+                    writer.add_alias([idx], owners[image])
+                    continue
+                if image:
+                    owners[image] = idx
+                thumb = slide.get("thumb")
+                writer.add(
+                    idx,
+                    self._file_data_url(image),
+                    # 无精灵图时缩略图即主图文件，留空由查看器复用主图
+                    self._file_data_url(thumb) if thumb != image else None,
+                    slide.get("sprite"),
+                )
+            for sheet, sprite in enumerate(manifest.get("sprites", [])):
+                if sprite:
+                    writer.add_sprite(sheet, self._file_data_url(sprite["url"]), (sprite["cols"], sprite["rows"]))
+        except BaseException:
+            writer.discard()
+            raise
+        return writer.close()
+
+    def read_slides(self, offset: int = 0, limit: int = PAGE_SIZE) -> dict:
+        """
+        从多文件投影片清单中读取一页投影片数据（清单按修改时间缓存，不重复解析）。
+
+        参数：
+            offset: 起始序号
+            limit: 最多返回的张数
+
+        返回：
+            {"total": 总张数, "offset": 起始序号, "slides": 该页投影片列表}
+        """
+        manifest_path = self.output_dir / self.DECK_MANIFEST
+        slides = _load_manifest(manifest_path, manifest_path.stat().st_mtime_ns)["slides"]
+        return {"total": len(slides), "offset": offset, "slides": slides[offset:offset + limit]}
+
+    @staticmethod
+    def _search_index(segments: list[SubtitleSegment]) -> dict:
+        """
+        构建字幕（含翻译）的倒排索引，查看器在 Web Worker 中据此查询，无需逐张扫描。
+
+        各文字的字母/数字按词索引（查询时前缀匹配），不以空格分词的文字按单字与相邻二元组索引；
+        文本先做 NFC 正规化并转小写，与查看器的查询处理一致。
+
+        返回：
+            {"terms": 排序后的词项列表, "postings": 对应的投影片序号列表（差分编码），
+             "texts": 各投影片的正规化全文（供不含词项的查询做子串匹配）}
+        """
+        index: dict[str, list[int]] = {}
+        texts = []
+        for idx, seg in enumerate(segments):
+            terms: set[str] = set()
+            full = unicodedata.normalize("NFC", f"{seg.text}\n{seg.translation or ''}").lower()
+            texts.append(full)
+            for word, cjk in _SEARCH_TOKEN_RE.findall(full):
+                if word:
+                    terms.add(word)
+                else:
+                    terms.update(cjk)
+                    terms.update(cjk[i:i + 2] for i in range(len(cjk) - 1))
+            for term in terms:
+                index.setdefault(term, []).append(idx)
+
+        sorted_terms = sorted(index)
+        postings = []
+        for term in sorted_terms:
+            ids = index[term]
+            postings.append([ids[0]] + [b - a for a, b in zip(ids, ids[1:])])
+        return {"terms": sorted_terms, "postings": postings, "texts": texts}
+
+    def _file_data_url(self, rel_path: Optional[str]) -> str:
+        """将多文件投影片中的图片文件转为 Data URL（缺失时返回空字符串）。"""
+        if not rel_path:
+            return ""
+        path = self.output_dir / rel_path
+        if not path.exists():
+            return ""
+        return self._data_url(path.read_bytes(), _IMAGE_MIME_BY_EXT.get(path.suffix[1:], "image/jpeg"))
 
+    @staticmethod
+    def _data_url(data: bytes, mime: str = "image/jpeg") -> str:
+        """将图片 bytes 转为 Data URL。"""
+        return f"data:{mime};base64,{base64.b64encode(data).decode('utf-8')}"
+
+    @staticmethod
+    def _resolve_title(metadata: dict) -> str:
+        """返回页面标题（繁体统一转为简体）。"""
         title = metadata.get("title", "YouTube 投影片")
         try:
             import opencc
             title = opencc.OpenCC("t2s").convert(title)
         except Exception:
             pass
-        html = self._render_html(title, slides, metadata, outline)
-
-        output_path = self.output_dir / "slides.html"
-        output_path.write_text(html, encoding="utf-8")
-        logger.info(f"投影片生成完成: {output_path} ({len(slides)} 张)")
-        return output_path
+        return title
 
-    def _render_html(self, title: str, slides: list[dict], metadata: dict, outline: Optional[str] = None) -> str:
-        """渲染完整的 HTML 字符串。"""
-        from app.services.ai_outline import _markdown_to_html
-        slides_json = json.dumps(slides, ensure_ascii=False)
-        meta_json = json.dumps(metadata, ensure_ascii=False)
-        slide_count = len(slides)
+    def _slide_entry(
+        self,
+        idx: int,
+        seg: SubtitleSegment,
+        image: Optional[str],
+        thumb: Optional[str],
+        sprite: Optional[tuple[int, int, int]] = None,
+    ) -> dict:
+        """构造单张投影片的数据字典（有精灵图坐标时侧边栏不再需要单独的缩略图）。"""
+        entry = {
+            "id": idx,
+            "start": seg.start,
+            "end": seg.end,
+            "text": seg.text,
+            "translation": seg.translation,
+            "image": image,
+            "thumb": None if sprite else thumb or image,
+            "timestamp": self._format_time(seg.start),
+        }
+        if sprite:
+            entry["sprite"] = list(sprite)
+        return entry
+
+    def _sprite_statement(self, sheet: int, url: str, grid: tuple[int, int]) -> str:
+        """生成一条 sprites[n]={...} 语句（精灵图地址与网格尺寸）。"""
+        cols, rows = grid
+        return f"sprites[{sheet}] = {self._json_for_script({'url': url, 'cols': cols, 'rows': rows})};\n"
+
+    def _render_head(
+        self,
+        title: str,
+        slide_count: int,
+        metadata: dict,
+        first: dict,
+        outline: Optional[str] = None,
+    ) -> str:
+        """渲染 HTML 头部：样式、页面结构（含预渲染的第一张投影片）及数据脚本开头。"""
+        meta_json = self._json_for_script(metadata)
         duration_str = self._format_time(metadata.get("duration", 0))
 
         # 预渲染第一张投影片，确保页面打开立即可见（不依赖 JS 执行）
-        first = slides[0] if slides else {}
         first_img = first.get("image", "")
         first_text = self._escape_html(first.get("text", ""))
         first_ts = first.get("timestamp", "")
@@ -170,9 +641,7 @@ class SlideBuilder:
     border-right: 1px solid var(--border);
     overflow-y: auto;
     padding: 8px;
-    display: flex;
-    flex-direction: column;
-    gap: 4px;
+    position: relative;
   }}
   .sidebar::-webkit-scrollbar {{ width: 4px; }}
   .sidebar::-webkit-scrollbar-thumb {{ background: var(--border); border-radius: 2px; }}
@@ -187,6 +656,7 @@ class SlideBuilder:
   .thumb-item:hover {{ border-color: var(--accent2); }}
   .thumb-item.active {{ border-color: var(--accent); }}
   .thumb-item img {{ width: 100%; aspect-ratio: 16/9; object-fit: cover; display: block; }}
+  .thumb-item .thumb-sprite {{ width: 100%; aspect-ratio: 16/9; background-repeat: no-repeat; }}
   .thumb-item .thumb-num {{
     position: absolute;
     top: 4px;
@@ -324,12 +794,15 @@ class SlideBuilder:
     overflow-y: auto;
     padding: 24px;
     display: none;
-    flex-direction: column;
-    gap: 24px;
+    position: relative;
   }}
   .all-view::-webkit-scrollbar {{ width: 6px; }}
   .all-view::-webkit-scrollbar-thumb {{ background: var(--border); border-radius: 3px; }}
-  .all-view.visible {{ display: flex; }}
+  .all-view.visible {{ display: block; }}
+
+  /* 虚拟列表：行绝对定位在撑开滚动高度的占位层上 */
+  .vlist-spacer {{ position: relative; }}
+  .vlist-row {{ position: absolute; top: 0; left: 0; right: 0; }}
   .all-slide-item {{
     display: flex;
     gap: 16px;
@@ -521,12 +994,117 @@ class SlideBuilder:
 </div>
 
 <script>
-const slides = {slides_json};
+const slides = new Array({slide_count});
+const sprites = [];
 const metadata = {meta_json};
+"""
+
+    def _render_tail(
+        self,
+        outline: Optional[str] = None,
+        page_url: Optional[str] = None,
+        search_index: Optional[dict] = None,
+        search_url: Optional[str] = None,
+        pack: Optional[list[tuple[int, int]]] = None,
+        pack_mime: str = "image/jpeg",
+    ) -> str:
+        """
+        渲染 HTML 尾部：投影片数据之后的交互脚本、搜索索引与大纲面板。
+
+        参数：
+            outline: AI 大纲 Markdown
+            page_url: 分页数据接口地址（多文件外壳按需加载未内联的投影片；单文件数据已全部内联，留空）
+            search_index: 内联的搜索索引（单文件）
+            search_url: 搜索索引文件地址（多文件外壳，首次搜索时由 Worker 加载）
+            pack: 打包图片的偏移表 [(offset, length), ...]（图片打包单文件；数据块由写出器追加在 </body> 前）
+            pack_mime: 打包图片的 MIME 类型
+        """
+        from app.services.ai_outline import _markdown_to_html
+
+        return f"""
+{_VIRTUAL_LIST_JS}
 let current = 0;
 let isAllMode = false;
-let allViewBuilt = false;
-let filteredIndices = slides.map((_, i) => i);
+let sidebarList = null;
+let allList = null;
+let filteredIndices = Array.from(slides, (_, i) => i);
+
+// 分页加载：未内联的投影片在导航、滚动或搜索需要时按页请求
+const PAGE_URL = {self._json_for_script(page_url)};
+const PAGE_SIZE = {self.PAGE_SIZE};
+const pageRequests = new Map();
+
+// 搜索：倒排索引在 Web Worker 中查询，结果作为侧边栏与全部模式的数据源
+const SEARCH_URL = {self._json_for_script(search_url)};
+let searchWorker = null;
+let searchSeq = 0;
+
+// 图片打包（单文件）：所有图片存于一个 Base64 块，按偏移表把单张图片解码为 Blob URL
+const PACK = {self._json_for_script(pack)};
+const PACK_MIME = {self._json_for_script(pack_mime)};
+const PACK_URL_LIMIT = 300;
+const packUrls = new Map();
+let packText = null;
+const domReady = new Promise(resolve => {{
+  if (document.readyState === 'loading') document.addEventListener('DOMContentLoaded', resolve);
+  else resolve();
+}});
+
+function packUrl(n) {{
+  let url = packUrls.get(n);
+  if (url) {{
+    packUrls.delete(n);
+    packUrls.set(n, url);
+    return url;
+  }}
+  if (packText === null) packText = document.getElementById('imagePack').textContent;
+  // 每张图片按 3 字节对齐打包，其 Base64 恰为块中的一段连续子串
+  const [offset, length] = PACK[n];
+  const bin = atob(packText.substr(offset / 3 * 4, Math.ceil(length / 3) * 4));
+  const bytes = new Uint8Array(length);
+  for (let i = 0; i < length; i++) bytes[i] = bin.charCodeAt(i);
+  url = URL.createObjectURL(new Blob([bytes], {{ type: PACK_MIME }}));
+  packUrls.set(n, url);
+  // 只保留最近使用的 Blob URL，已显示的图片不受撤销影响
+  if (packUrls.size > PACK_URL_LIMIT) {{
+    const [oldest, oldUrl] = packUrls.entries().next().value;
+    URL.revokeObjectURL(oldUrl);
+    packUrls.delete(oldest);
+  }}
+  return url;
+}}
+
+// 解析图片地址：打包图片（pack:N）需等页面末尾的数据块解析完成
+function resolveSrc(src, cb) {{
+  if (!src.startsWith('pack:')) {{
+    cb(src);
+    return;
+  }}
+  domReady.then(() => cb(packUrl(+src.slice(5))));
+}}
+
+function loadPage(idx) {{
+  const page = Math.floor(idx / PAGE_SIZE);
+  if (!PAGE_URL || slides[page * PAGE_SIZE] !== undefined) return Promise.resolve();
+  if (!pageRequests.has(page)) {{
+    const req = fetch(`${{PAGE_URL}}?offset=${{page * PAGE_SIZE}}&limit=${{PAGE_SIZE}}`)
+      .then(r => {{ if (!r.ok) throw new Error(r.status); return r.json(); }})
+      .then(data => {{
+        data.slides.forEach(s => {{ slides[s.id] = s; }});
+        // 一页数据到达后重绘已渲染的行
+        sidebarList?.refreshAll();
+        allList?.refreshAll();
+      }})
+      .catch(err => {{ pageRequests.delete(page); throw err; }});
+    pageRequests.set(page, req);
+  }}
+  return pageRequests.get(page);
+}}
+
+function withSlide(idx, cb) {{
+  if (slides[idx]) {{ cb(slides[idx]); return; }}
+  loadPage(idx).then(() => {{ if (slides[idx]) cb(slides[idx]); }}).catch(() => {{}});
+}}
 
 // 初始化
 function init() {{
@@ -534,133 +1112,186 @@ function init() {{
   goTo(0);
   updateProgress();
   // 侧边栏延迟到下一帧，避免阻塞首屏渲染
-  requestAnimationFrame(() => {{
-    buildSidebar();
-    document.getElementById('thumb-0')?.classList.add('active');
-  }});
+  requestAnimationFrame(buildSidebar);
 }}
 
+// 侧边栏与全部模式均为虚拟列表：只有可视区域附近的行存在于 DOM 中
 function buildSidebar() {{
-  const sb = document.getElementById('sidebar');
-  const BATCH = 20;  // 每批渲染数量
-
-  function renderBatch(start) {{
-    if (start >= slides.length) return;
-    const frag = document.createDocumentFragment();
-    const end = Math.min(start + BATCH, slides.length);
-    for (let i = start; i < end; i++) {{
-      const slide = slides[i];
-      const div = document.createElement('div');
-      div.className = 'thumb-item';
-      div.id = 'thumb-' + i;
-      div.onclick = () => {{ goTo(i); if (isAllMode) toggleMode(); }};
-
-      const img = document.createElement('img');
-      img.src = slide.thumb || slide.image;
-      img.alt = '';
-
-      const numSpan = document.createElement('span');
-      numSpan.className = 'thumb-num';
-      numSpan.textContent = i + 1;
-
-      const textDiv = document.createElement('div');
-      textDiv.className = 'thumb-text';
-      textDiv.textContent = slide.text;
-
-      div.appendChild(img);
-      div.appendChild(numSpan);
-      div.appendChild(textDiv);
-      frag.appendChild(div);
-    }}
-    sb.appendChild(frag);
-    if (end < slides.length) {{
-      setTimeout(() => renderBatch(end), 0);
-    }}
+  sidebarList = new VirtualList(document.getElementById('sidebar'), slides.length, {{
+    gap: 4,
+    estimate: 140,
+    create: createThumb,
+    render: renderThumb,
+  }});
+  sidebarList.setItems(filteredIndices);
+  sidebarList.scrollTo(current);
+}}
+
+function createThumb() {{
+  const div = document.createElement('div');
+  div.className = 'thumb-item';
+  div.onclick = () => {{ goTo(+div.dataset.idx); if (isAllMode) toggleMode(); }};
+
+  const img = document.createElement('img');
+  img.loading = 'lazy';
+  img.alt = '';
+
+  const sprite = document.createElement('div');
+  sprite.className = 'thumb-sprite';
+
+  const numSpan = document.createElement('span');
+  numSpan.className = 'thumb-num';
+
+  const textDiv = document.createElement('div');
+  textDiv.className = 'thumb-text';
+
+  div.appendChild(img);
+  div.appendChild(sprite);
+  div.appendChild(numSpan);
+  div.appendChild(textDiv);
+  return div;
+}}
+
+function renderThumb(div, i) {{
+  const slide = slides[i];
+  div.id = 'thumb-' + i;
+  div.dataset.idx = i;
+  div.classList.toggle('active', i === current);
+  div.querySelector('.thumb-num').textContent = i + 1;
+  div.querySelector('.thumb-text').textContent = slide ? slide.text : '';
+  const img = div.querySelector('img');
+  const sprite = div.querySelector('.thumb-sprite');
+  const sheet = slide && slide.sprite && sprites[slide.sprite[0]];
+  if (sheet) {{
+    setImage(img, null);
+    img.style.display = 'none';
+    sprite.style.display = '';
+    setSprite(sprite, sheet, slide.sprite[1], slide.sprite[2]);
+  }} else {{
+    sprite.style.display = 'none';
+    img.style.display = '';
+    setImage(img, slide && (slide.thumb || slide.image));
   }}
+  if (!slide) loadPage(i).catch(() => {{}});
+}}
 
-  renderBatch(0);
+// 精灵图缩略图：按网格百分比定位背景，同一张精灵图只请求、解码一次
+function setSprite(el, sheet, col, row) {{
+  const pos = (i, n) => n > 1 ? i * 100 / (n - 1) : 0;
+  el.style.backgroundSize = `${{sheet.cols * 100}}% ${{sheet.rows * 100}}%`;
+  el.style.backgroundPosition = `${{pos(col, sheet.cols)}}% ${{pos(row, sheet.rows)}}%`;
+  el.dataset.want = sheet.url;
+  if (el.dataset.shown === sheet.url) return;
+  el.style.backgroundImage = '';
+  resolveSrc(sheet.url, url => {{
+    if (el.dataset.want !== sheet.url) return;
+    el.style.backgroundImage = `url("${{url}}")`;
+    el.dataset.shown = sheet.url;
+  }});
 }}
 
 function buildAllView() {{
-  const view = document.getElementById('allView');
-  const observer = new IntersectionObserver((entries) => {{
-    entries.forEach(entry => {{
-      if (entry.isIntersecting) {{
-        const img = entry.target;
-        if (!img.dataset.loaded) {{
-          img.src = slides[+img.dataset.idx].image;
-          img.dataset.loaded = '1';
-          observer.unobserve(img);
-        }}
-      }}
-    }});
-  }}, {{ rootMargin: '300px' }});
-
-  const frag = document.createDocumentFragment();
-  slides.forEach((slide, i) => {{
-    const div = document.createElement('div');
-    div.className = 'all-slide-item';
-    div.id = 'all-' + i;
-    div.onclick = () => {{ goTo(i); toggleMode(); }};
-
-    const img = document.createElement('img');
-    img.className = 'all-slide-img';
-    img.dataset.idx = i;
-    img.alt = '';
-    observer.observe(img);
-
-    const info = document.createElement('div');
-    info.className = 'all-slide-info';
-
-    const num = document.createElement('div');
-    num.className = 'all-slide-num';
-    num.textContent = '#' + (i + 1) + '  ' + slide.timestamp;
-
-    const text = document.createElement('div');
-    text.className = 'all-slide-text';
-    text.textContent = slide.text;
-
-    info.appendChild(num);
-    info.appendChild(text);
+  allList = new VirtualList(document.getElementById('allView'), slides.length, {{
+    gap: 24,
+    estimate: 170,
+    create: createAllItem,
+    render: renderAllItem,
+  }});
+  allList.setItems(filteredIndices);
+}}
 
-    if (slide.translation) {{
-      const trans = document.createElement('div');
-      trans.className = 'all-slide-trans';
-      trans.textContent = slide.translation;
-      info.appendChild(trans);
-    }}
+function createAllItem() {{
+  const div = document.createElement('div');
+  div.className = 'all-slide-item';
+  div.onclick = () => {{ goTo(+div.dataset.idx); toggleMode(); }};
+
+  const img = document.createElement('img');
+  img.className = 'all-slide-img';
+  img.alt = '';
+
+  const info = document.createElement('div');
+  info.className = 'all-slide-info';
+
+  const num = document.createElement('div');
+  num.className = 'all-slide-num';
+
+  const text = document.createElement('div');
+  text.className = 'all-slide-text';
+
+  const trans = document.createElement('div');
+  trans.className = 'all-slide-trans';
 
-    div.appendChild(img);
-    div.appendChild(info);
-    frag.appendChild(div);
+  info.appendChild(num);
+  info.appendChild(text);
+  info.appendChild(trans);
+  div.appendChild(img);
+  div.appendChild(info);
+  return div;
+}}
+
+function renderAllItem(div, i) {{
+  const slide = slides[i];
+  div.id = 'all-' + i;
+  div.dataset.idx = i;
+  div.querySelector('.all-slide-num').textContent = '#' + (i + 1) + (slide ? '  ' + slide.timestamp : '');
+  div.querySelector('.all-slide-text').textContent = slide ? slide.text : '';
+  const trans = div.querySelector('.all-slide-trans');
+  trans.textContent = slide && slide.translation || '';
+  trans.style.display = slide && slide.translation ? '' : 'none';
+  setImage(div.querySelector('.all-slide-img'), slide && slide.image);
+  if (!slide) loadPage(i).catch(() => {{}});
+}}
+
+// 复用的元素切换图片时，先清除旧图，避免短暂显示上一行的内容
+function setImage(img, src) {{
+  img.dataset.want = src || '';
+  if (!src) {{
+    img.removeAttribute('src');
+    return;
+  }}
+  if (img.dataset.shown === src) return;
+  if (img.getAttribute('src') === src) {{
+    img.dataset.shown = src;
+    return;
+  }}
+  img.removeAttribute('src');
+  resolveSrc(src, url => {{
+    if (img.dataset.want !== src) return;
+    img.src = url;
+    img.dataset.shown = src;
   }});
-  view.appendChild(frag);
 }}
 
 function goTo(idx) {{
   if (idx < 0 || idx >= slides.length) return;
-  // 去活当前缩略图
-  document.getElementById(`thumb-${{current}}`)?.classList.remove('active');
+  const prevIdx = current;
   current = idx;
-  const slide = slides[current];
 
-  // 更新主视图
-  document.getElementById('slideImg').src = slide.image;
-  document.getElementById('slideTimestamp').textContent = slide.timestamp;
-  document.getElementById('slideText').textContent = slide.text;
+  // 更新主视图（所在页未加载时先请求，到达后若仍停留在该张再渲染）
+  withSlide(idx, slide => {{
+    if (current !== idx) return;
+    setImage(document.getElementById('slideImg'), slide.image);
+    document.getElementById('slideTimestamp').textContent = slide.timestamp;
+    document.getElementById('slideText').textContent = slide.text;
 
-  const transEl = document.getElementById('slideTranslation');
-  if (slide.translation) {{
-    transEl.textContent = slide.translation;
-    transEl.style.display = '';
-  }} else {{
-    transEl.style.display = 'none';
-  }}
+    const transEl = document.getElementById('slideTranslation');
+    if (slide.translation) {{
+      transEl.textContent = slide.translation;
+      transEl.style.display = '';
+    }} else {{
+      transEl.style.display = 'none';
+    }}
+  }});
+  // 预取相邻页，连续翻页时不等待网络
+  loadPage(Math.min(idx + PAGE_SIZE / 2, slides.length - 1)).catch(() => {{}});
+  loadPage(Math.max(idx - PAGE_SIZE / 2, 0)).catch(() => {{}});
 
   // 更新缩略图活跃状态
-  const thumb = document.getElementById(`thumb-${{current}}`);
-  thumb?.classList.add('active');
-  thumb?.scrollIntoView({{ block: 'nearest' }});
+  if (sidebarList) {{
+    sidebarList.refresh(prevIdx);
+    sidebarList.refresh(current);
+    sidebarList.scrollTo(current);
+  }}
 
   // 更新导航
   document.getElementById('navCounter').textContent = `${{current + 1}} / ${{slides.length}}`;
@@ -682,15 +1313,16 @@ function updateProgress() {{
 
 function toggleMode() {{
   isAllMode = !isAllMode;
-  if (isAllMode && !allViewBuilt) {{
-    buildAllView();
-    allViewBuilt = true;
-  }}
   document.getElementById('slideView').style.display = isAllMode ? 'none' : '';
   document.getElementById('navControls').style.display = isAllMode ? 'none' : '';
   document.getElementById('allView').classList.toggle('visible', isAllMode);
   document.getElementById('modeBtn').textContent = isAllMode ? '▶ 单张' : '📋 全部';
   document.getElementById('modeBtn').classList.toggle('active', isAllMode);
+  // 全部模式在可见后再构建，虚拟列表需要容器的实际尺寸
+  if (isAllMode) {{
+    if (!allList) buildAllView();
+    allList.scrollTo(current);
+  }}
 }}
 
 function toggleSearch() {{
@@ -704,25 +1336,44 @@ function toggleSearch() {{
   }}
 }}
 
-function filterSlides(query) {{
-  const q = query.toLowerCase().trim();
-  const allItems = document.querySelectorAll('.all-slide-item');
-  const thumbItems = document.querySelectorAll('.thumb-item');
+function getSearchWorker() {{
+  if (!searchWorker) {{
+    const src = document.getElementById('searchWorker').textContent;
+    searchWorker = new Worker(URL.createObjectURL(new Blob([src], {{ type: 'text/javascript' }})));
+    searchWorker.onmessage = e => {{
+      if (e.data.seq === searchSeq) applyFilter(e.data.ids);
+    }};
+    const embedded = document.getElementById('searchIndex');
+    searchWorker.postMessage(embedded
+      ? {{ type: 'load', json: embedded.textContent }}
+      : {{ type: 'load', url: new URL(SEARCH_URL, location.href).href }});
+  }}
+  return searchWorker;
+}}
 
-  if (!q) {{
-    allItems.forEach(el => el.style.display = '');
-    thumbItems.forEach(el => el.style.display = '');
+function filterSlides(query) {{
+  const seq = ++searchSeq;  // 丢弃过期的查询结果
+  if (!query.trim()) {{
+    applyFilter(null);
     return;
   }}
+  getSearchWorker().postMessage({{ type: 'query', seq, q: query }});
+}}
 
-  slides.forEach((slide, i) => {{
-    const match = slide.text.toLowerCase().includes(q) ||
-                  (slide.translation && slide.translation.toLowerCase().includes(q));
-    const allEl = document.getElementById(`all-${{i}}`);
-    const thumbEl = document.getElementById(`thumb-${{i}}`);
-    if (allEl) allEl.style.display = match ? '' : 'none';
-    if (thumbEl) thumbEl.style.display = match ? '' : 'none';
-  }});
+// ids 为 null 表示全部显示；虚拟列表只重绘可视区域内的行
+function applyFilter(ids) {{
+  if (ids) {{
+    const show = new Uint8Array(slides.length);
+    ids.forEach(i => {{ show[i] = 1; }});
+    filteredIndices = [];
+    for (let i = 0; i < slides.length; i++) {{
+      if (show[i]) filteredIndices.push(i);
+    }}
+  }} else {{
+    filteredIndices = Array.from(slides, (_, i) => i);
+  }}
+  sidebarList?.setItems(filteredIndices);
+  allList?.setItems(filteredIndices);
 }}
 
 function escHtml(str) {{
@@ -745,6 +1396,8 @@ document.addEventListener('keydown', e => {{
 
 init();
 </script>
+<script type="text/js-worker" id="searchWorker">{_SEARCH_WORKER_JS}</script>
+{f'<script type="application/json" id="searchIndex">{self._json_for_script(search_index)}</script>' if search_index else ''}
 
 {f'''
 <!-- 大纲模态框 -->
@@ -777,6 +1430,11 @@ function toggleOutline() {{
             return f"{h:02d}:{m:02d}:{s:02d}"
         return f"{m:02d}:{s:02d}"
 
+    @staticmethod
+    def _json_for_script(data) -> str:
+        """序列化为可直接嵌入 <script> 的 JSON（转义 </ 防止提前闭合标签）。"""
+        return json.dumps(data, ensure_ascii=False).replace("</", "<\\/")
+
     @staticmethod
     def _escape_html(text: str) -> str:
         """转义 HTML 特殊字符。"""
@@ -786,3 +1444,520 @@ function toggleOutline() {{
             .replace(">", "&gt;")
             .replace('"', "&quot;")
         )
+
+
+class SlideStreamWriter:
+    """
+    单文件 HTML 投影片的流式写出器。
+
+    先写模板头部，再把每张投影片写成一条 slides[i]={...} 语句（到达顺序任意），最后写尾部脚本。
+    头部预渲染第一张投影片，因此在第一张图片到达前，其余先到的图片暂存于内存。
+    写入临时文件，close() 时原子替换为正式文件。
+    """
+
+    def __init__(
+        self,
+        builder: SlideBuilder,
+        output_path: Path,
+        segments: list[SubtitleSegment],
+        title: str,
+        metadata: dict,
+        outline: Optional[str] = None,
+        codec: Optional[ImageCodec] = None,
+    ):
+        """
+        初始化写出器并打开临时文件。
+
+        参数：
+            builder: 提供模板渲染的 SlideBuilder
+            output_path: 最终输出文件路径
+            segments: 字幕片段列表
+            title: 页面标题
+            metadata: 影片元数据
+            outline: AI 大纲 Markdown
+            codec: add_encoded() 传入图片的编码格式（默认 JPEG）
+        """
+        self.builder = builder
+        self.output_path = output_path
+        self.segments = segments
+        self.title = title
+        self.metadata = metadata
+        self.outline = outline
+        self._tmp_path = output_path.with_name(output_path.name + ".tmp")
+        self._fh = self._tmp_path.open("w", encoding="utf-8")
+        self._head_written = False
+        self._pending: dict[int, tuple[str, Optional[str], Optional[tuple[int, int, int]]]] = {}
+        self._pending_sprites: list[str] = []
+        self._written = [False] * len(segments)
+        self.codec = codec or IMAGE_CODECS["jpeg"]
+        self._sprites = SpriteSheetPacker(len(segments), codec=self.codec) if PIL_AVAILABLE else None
+        self._aliases: list[tuple[int, int]] = []
+
+    def add(
+        self,
+        idx: int,
+        image: str,
+        thumb: Optional[str] = None,
+        sprite: Optional[tuple[int, int, int]] = None,
+    ) -> None:
+        """
+        写入一张投影片的图片数据。
+
+        参数：
+            idx: 片段序号
+            image: 主图 Data URL
+            thumb: 缩略图 Data URL（留空则复用主图）
+            sprite: 精灵图坐标 (组号, 列, 行)，有则侧边栏使用精灵图
+        """
+        if idx >= len(self.segments) or self._written[idx]:
+            return
+        if not self._head_written:
+            if idx != 0:
+                self._pending[idx] = (image, thumb, sprite)
+                return
+            self._write_head(image, thumb)
+            self._write_entry(0, image, thumb, sprite)
+            for pending_idx, pending in self._pending.items():
+                self._write_entry(pending_idx, *pending)
+            self._pending.clear()
+            self._fh.write("".join(self._pending_sprites))
+            self._pending_sprites.clear()
+            return
+        self._write_entry(idx, image, thumb, sprite)
+
+    def add_sprite(self, sheet: int, url: str, grid: tuple[int, int]) -> None:
+        """
+        写入一张精灵图。
+
+        参数：
+            sheet: 组号
+            url: 精灵图 Data URL
+            grid: 网格尺寸 (列数, 行数)
+        """
+        statement = self.builder._sprite_statement(sheet, url, grid)
+        if self._head_written:
+            self._fh.write(statement)
+        else:
+            self._pending_sprites.append(statement)
+
+    def add_encoded(self, indices: list[int], image: bytes, thumb: Optional[bytes] = None) -> None:
+        """
+        写入编码好的图片 bytes；共用同一帧的多个片段只做一次 Base64 转换。
+
+        格子拼入精灵图（Pillow 可用时），一组到齐即写出该组精灵图；否则侧边栏复用主图。
+
+        参数：
+            indices: 共用该帧的片段序号列表
+            image: 主图 bytes
+            thumb: 侧边栏格子的 RGB 原始像素（见 ImageOptimizer.optimize_frame）
+        """
+        image_url = self.builder._data_url(image, self.codec.mime)
+        if self._sprites:
+            completed = self._sprites.add(indices, thumb)
+            for idx in indices:
+                if idx < len(self.segments):
+                    self.add(idx, image_url, None, self._sprites.coords(idx))
+            for sheet, data in completed:
+                self.add_sprite(sheet, self.builder._data_url(data, self.codec.mime), self._sprites.grid(sheet))
+            return
+        for idx in indices:
+            self.add(idx, image_url)
+
+    def add_alias(self, indices: list[int], source: int) -> None:
+        """
+        登记复用其他投影片图片的投影片（帧去重）：先写出不含图片的数据，收尾时在页面中引用同一字符串。
+
+        参数：
+            indices: 复用图片的片段序号列表（不含第一张）
+            source: 被复用的片段序号
+        """
+        if self._sprites:
+            for sheet, data in self._sprites.skip(indices):
+                self.add_sprite(sheet, self.builder._data_url(data, self.codec.mime), self._sprites.grid(sheet))
+        for idx in indices:
+            if idx < len(self.segments) and not self._written[idx]:
+                self.add(idx, "")
+                self._aliases.append((idx, source))
+
+    def close(self) -> Path:
+        """
+        补齐未写入的投影片（无图片）并写出尾部，原子替换为正式文件。
+
+        返回：
+            生成的 HTML 文件路径
+        """
+        if not self._head_written:
+            if self.segments:
+                self.add(0, "")
+            else:
+                self._write_head("", None)
+        for idx, written in enumerate(self._written):
+            if not written:
+                self._write_entry(idx, "", None)
+        if self._sprites:
+            for sheet, data in self._sprites.flush():
+                self.add_sprite(sheet, self.builder._data_url(data, self.codec.mime), self._sprites.grid(sheet))
+        if self._aliases:
+            self._fh.write(
+                f"{self.builder._json_for_script(self._aliases)}.forEach(([i, src]) => {{\n"
+                "  Object.assign(slides[i], { image: slides[src].image, thumb: slides[src].thumb, sprite: slides[src].sprite });\n"
+                "});\n"
+            )
+        self._fh.write(self.builder._render_tail(
+            self.outline, search_index=self.builder._search_index(self.segments)
+        ))
+        self._fh.close()
+        self._tmp_path.replace(self.output_path)
+        logger.info(f"投影片生成完成: {self.output_path} ({len(self.segments)} 张)")
+        return self.output_path
+
+    def discard(self) -> None:
+        """放弃写出，删除临时文件（流水线失败时调用）。"""
+        if not self._fh.closed:
+            self._fh.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+    def _write_head(self, image: str, thumb: Optional[str]) -> None:
+        """写出模板头部（需要第一张投影片的图片用于预渲染）。"""
+        first = self.builder._slide_entry(0, self.segments[0], image, thumb) if self.segments else {}
+        self._fh.write(self.builder._render_head(
+            self.title, len(self.segments), self.metadata, first, self.outline
+        ))
+        self._head_written = True
+
+    def _write_entry(
+        self,
+        idx: int,
+        image: str,
+        thumb: Optional[str],
+        sprite: Optional[tuple[int, int, int]] = None,
+    ) -> None:
+        """写出一条 slides[i]={...} 语句。"""
+        entry = self.builder._slide_entry(idx, self.segments[idx], image, thumb, sprite)
+        self._fh.write(f"slides[{idx}] = {self.builder._json_for_script(entry)};\n")
+        self._written[idx] = True
+
+
+class DeckWriter:
+    """
+    多文件投影片写出器：HTML 外壳 + slides.json 清单 + images/ 二进制图片目录。
+
+    图片到达即写入文件，清单只记录文件名，close() 时一次写出；浏览器按需拉取图片，
+    省去单文件模式下 Base64 约 33% 的体积膨胀与整页解析等待。
+    图片文件名带内容哈希，可被浏览器长期缓存（任务 ID 被复用或重新处理时地址随之改变）。
+    """
+
+    def __init__(
+        self,
+        builder: SlideBuilder,
+        segments: list[SubtitleSegment],
+        title: str,
+        metadata: dict,
+        outline: Optional[str] = None,
+        codec: Optional[ImageCodec] = None,
+    ):
+        """
+        初始化写出器并创建图片目录。
+
+        参数：
+            builder: 提供模板渲染的 SlideBuilder
+            segments: 字幕片段列表
+            title: 页面标题
+            metadata: 影片元数据
+            outline: AI 大纲 Markdown
+            codec: 图片编码格式（决定文件扩展名，默认 JPEG）
+        """
+        self.builder = builder
+        self.segments = segments
+        self.title = title
+        self.metadata = metadata
+        self.outline = outline
+        self.codec = codec or IMAGE_CODECS["jpeg"]
+        self.ext = self.codec.ext
+        self.images_dir = builder.output_dir / builder.DECK_IMAGES
+        shutil.rmtree(self.images_dir, ignore_errors=True)
+        self.images_dir.mkdir(parents=True)
+        self._images: list[Optional[tuple[str, Optional[str]]]] = [None] * len(segments)
+        self._sprites = SpriteSheetPacker(len(segments), codec=self.codec) if PIL_AVAILABLE else None
+        self._sprite_files: list[Optional[dict]] = []
+        self._aliases: dict[int, int] = {}
+
+    def add_encoded(self, indices: list[int], image: bytes, thumb: Optional[bytes] = None) -> None:
+        """
+        写入编码好的图片；共用同一帧的多个片段共用同一文件。
+
+        参数：
+            indices: 共用该帧的片段序号列表
+            image: 主图 bytes
+            thumb: 侧边栏格子的 RGB 原始像素（Pillow 不可用时忽略，侧边栏复用主图）
+        """
+        if not indices:
+            return
+        image_rel = f"{self.builder.DECK_IMAGES}/{indices[0]:05d}-{self._digest(image)}.{self.ext}"
+        (self.builder.output_dir / image_rel).write_bytes(image)
+        if self._sprites:
+            for sheet, data in self._sprites.add(indices, thumb):
+                self._write_sprite(sheet, data)
+        for idx in indices:
+            if idx < len(self._images):
+                self._images[idx] = (image_rel, None)
+
+    def add_alias(self, indices: list[int], source: int) -> None:
+        """
+        登记复用其他投影片图片的投影片（帧去重），收尾时指向同一图片文件。
+
+        参数：
+            indices: 复用图片的片段序号列表
+            source: 被复用的片段序号
+        """
+        if self._sprites:
+            for sheet, data in self._sprites.skip(indices):
+                self._write_sprite(sheet, data)
+        for idx in indices:
+            self._aliases[idx] = source
+
+    def close(self) -> Path:
+        """
+        写出 slides.json 清单与 index.html 外壳。
+
+        返回：
+            外壳 HTML 文件路径
+        """
+        if self._sprites:
+            for sheet, data in self._sprites.flush():
+                self._write_sprite(sheet, data)
+        slides = []
+        for idx, seg in enumerate(self.segments):
+            ref = self._aliases.get(idx, idx)
+            image_rel, thumb_rel = self._images[ref] or (None, None)
+            sprite = self._sprites.coords(ref) if self._sprites else None
+            slides.append(self.builder._slide_entry(idx, seg, image_rel, thumb_rel, sprite))
+
+        output_dir = self.builder.output_dir
+        manifest = {
+            "title": self.title,
+            "metadata": self.metadata,
+            "outline": self.outline,
+            "slides": slides,
+            "sprites": self._sprite_files,
+        }
+        manifest_tmp = output_dir / (self.builder.DECK_MANIFEST + ".tmp")
+        manifest_tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+        manifest_tmp.replace(output_dir / self.builder.DECK_MANIFEST)
+        (output_dir / self.builder.DECK_SEARCH).write_text(
+            json.dumps(self.builder._search_index(self.segments), ensure_ascii=False, separators=(",", ":")),
+            encoding="utf-8",
+        )
+
+        # 外壳内联第一页数据，其余页由浏览器经分页接口（外壳所在目录的上一级 /slides）按需加载
+        first = slides[0] if slides else {}
+        first_page = "".join(
+            f"slides[{entry['id']}] = {self.builder._json_for_script(entry)};\n"
+            for entry in slides[: self.builder.PAGE_SIZE]
+        ) + "".join(
+            self.builder._sprite_statement(sheet, sprite["url"], (sprite["cols"], sprite["rows"]))
+            for sheet, sprite in enumerate(self._sprite_files)
+            if sprite
+        )
+        shell_path = output_dir / self.builder.DECK_SHELL
+        shell_path.write_text(
+            self.builder._render_head(self.title, len(slides), self.metadata, first, self.outline)
+            + first_page
+            + self.builder._render_tail(
+                self.outline, page_url="../slides", search_url=self.builder.DECK_SEARCH
+            ),
+            encoding="utf-8",
+        )
+        # 旧的单文件导出已过期，下载时按需重新打包
+        (output_dir / "slides.html").unlink(missing_ok=True)
+        logger.info(f"多文件投影片生成完成: {shell_path} ({len(slides)} 张)")
+        return shell_path
+
+    def discard(self) -> None:
+        """放弃写出，删除已写入的图片（流水线失败时调用）。"""
+        shutil.rmtree(self.images_dir, ignore_errors=True)
+
+    def _write_sprite(self, sheet: int, data: bytes) -> None:
+        """写出一张精灵图文件并登记其地址与网格尺寸。"""
+        rel = f"{self.builder.DECK_IMAGES}/sprite_{sheet:03d}-{self._digest(data)}.{self.ext}"
+        (self.builder.output_dir / rel).write_bytes(data)
+        cols, rows = self._sprites.grid(sheet)
+        self._sprite_files.extend([None] * (sheet + 1 - len(self._sprite_files)))
+        self._sprite_files[sheet] = {"url": rel, "cols": cols, "rows": rows}
+
+    @staticmethod
+    def _digest(data: bytes) -> str:
+        """返回图片内容的短哈希（写入文件名）。"""
+        return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+
+class PackedSlideWriter:
+    """
+    图片打包的单文件 HTML 投影片写出器。
+
+    图片到达即追加到临时二进制文件（每张按 3 字节对齐，使其 Base64 为整块中的连续子串），
+    close() 时依次写出模板、投影片数据（图片以 pack:N 引用）与整块 Base64 数据，原子替换为正式文件。
+    """
+
+    # Base64 流式编码的读取块大小（须为 3 的倍数）
+    CHUNK_SIZE = 3 * 256 * 1024
+
+    def __init__(
+        self,
+        builder: SlideBuilder,
+        output_path: Path,
+        segments: list[SubtitleSegment],
+        title: str,
+        metadata: dict,
+        outline: Optional[str] = None,
+        codec: Optional[ImageCodec] = None,
+    ):
+        """
+        初始化写出器并打开临时二进制文件。
+
+        参数：
+            builder: 提供模板渲染的 SlideBuilder
+            output_path: 最终输出文件路径
+            segments: 字幕片段列表
+            title: 页面标题
+            metadata: 影片元数据
+            outline: AI 大纲 Markdown
+            codec: 图片编码格式（决定 MIME 类型，默认 JPEG）
+        """
+        self.builder = builder
+        self.output_path = output_path
+        self.segments = segments
+        self.title = title
+        self.metadata = metadata
+        self.outline = outline
+        self.codec = codec or IMAGE_CODECS["jpeg"]
+        self.mime = self.codec.mime
+        self._tmp_path = output_path.with_name(output_path.name + ".tmp")
+        self._pack_path = output_path.with_name(output_path.name + ".pack.tmp")
+        self._pack = self._pack_path.open("wb")
+        self._offset = 0
+        self._table: list[tuple[int, int]] = []
+        self._refs: list[Optional[tuple[int, Optional[int]]]] = [None] * len(segments)
+        self._sprites = SpriteSheetPacker(len(segments), codec=self.codec) if PIL_AVAILABLE else None
+        self._sprite_refs: dict[int, int] = {}
+        self._aliases: dict[int, int] = {}
+
+    def add_encoded(self, indices: list[int], image: bytes, thumb: Optional[bytes] = None) -> None:
+        """
+        追加编码好的图片；共用同一帧的多个片段共用同一份数据。
+
+        参数：
+            indices: 共用该帧的片段序号列表
+            image: 主图 bytes
+            thumb: 侧边栏格子的 RGB 原始像素（Pillow 不可用时忽略，侧边栏复用主图）
+        """
+        if not indices:
+            return
+        image_ref = self._append(image)
+        if self._sprites:
+            for sheet, data in self._sprites.add(indices, thumb):
+                self._sprite_refs[sheet] = self._append(data)
+        for idx in indices:
+            if idx < len(self._refs):
+                self._refs[idx] = (image_ref, None)
+
+    def add_alias(self, indices: list[int], source: int) -> None:
+        """
+        登记复用其他投影片图片的投影片（帧去重），收尾时引用同一份打包数据。
+
+        参数：
+            indices: 复用图片的片段序号列表
+            source: 被复用的片段序号
+        """
+        if self._sprites:
+            for sheet, data in self._sprites.skip(indices):
+                self._sprite_refs[sheet] = self._append(data)
+        for idx in indices:
+            self._aliases[idx] = source
+
+    def close(self) -> Path:
+        """
+        写出 HTML（第一张投影片内联 Data URL 以便立即显示）并原子替换为正式文件。
+
+        返回：
+            生成的 HTML 文件路径
+        """
+        if self._sprites:
+            for sheet, data in self._sprites.flush():
+                self._sprite_refs[sheet] = self._append(data)
+        self._pack.close()
+        entries = []
+        for idx, seg in enumerate(self.segments):
+            ref = self._aliases.get(idx, idx)
+            image_ref, thumb_ref = self._refs[ref] or (None, None)
+            image = f"pack:{image_ref}" if image_ref is not None else ""
+            thumb = f"pack:{thumb_ref}" if thumb_ref is not None else None
+            sprite = self._sprites.coords(ref) if self._sprites else None
+            entries.append(self.builder._slide_entry(idx, seg, image, thumb, sprite))
+        if entries and self._refs[0]:
+            entries[0]["image"] = self.builder._data_url(self._read(self._refs[0][0]), self.mime)
+
+        tail = self.builder._render_tail(
+            self.outline,
+            search_index=self.builder._search_index(self.segments),
+            pack=self._table,
+            pack_mime=self.mime,
+        )
+        body_end = tail.rindex("</body>")
+        try:
+            with self._tmp_path.open("w", encoding="utf-8") as fh:
+                fh.write(self.builder._render_head(
+                    self.title, len(entries), self.metadata, entries[0] if entries else {}, self.outline
+                ))
+                for entry in entries:
+                    fh.write(f"slides[{entry['id']}] = {self.builder._json_for_script(entry)};\n")
+                for sheet, ref in sorted(self._sprite_refs.items()):
+                    fh.write(self.builder._sprite_statement(sheet, f"pack:{ref}", self._sprites.grid(sheet)))
+                fh.write(tail[:body_end])
+                fh.write('<script type="application/octet-stream" id="imagePack">')
+                with self._pack_path.open("rb") as pack:
+                    while chunk := pack.read(self.CHUNK_SIZE):
+                        fh.write(base64.b64encode(chunk).decode("ascii"))
+                fh.write("</script>\n")
+                fh.write(tail[body_end:])
+            self._tmp_path.replace(self.output_path)
+        finally:
+            self._pack_path.unlink(missing_ok=True)
+        logger.info(
+            f"投影片生成完成（图片打包）: {self.output_path} "
+            f"({len(entries)} 张, {len(self._table)} 张图片, {self._offset / 1024 / 1024:.1f} MB)"
+        )
+        return self.output_path
+
+    def discard(self) -> None:
+        """放弃写出，删除临时文件（流水线失败时调用）。"""
+        if not self._pack.closed:
+            self._pack.close()
+        self._pack_path.unlink(missing_ok=True)
+        self._tmp_path.unlink(missing_ok=True)
+
+    def _append(self, data: bytes) -> int:
+        """追加一张图片（补齐到 3 字节的倍数），返回其在偏移表中的序号。"""
+        pad = -len(data) % 3
+        self._pack.write(data + b"\0" * pad)
+        self._table.append((self._offset, len(data)))
+        self._offset += len(data) + pad
+        return len(self._table) - 1
+
+    def _read(self, ref: int) -> bytes:
+        """从临时二进制文件读回一张图片。"""
+        offset, length = self._table[ref]
+        with self._pack_path.open("rb") as pack:
+            pack.seek(offset)
+            return pack.read(length)
+
+
+# 多文件投影片图片扩展名 → MIME 类型（打包下载时生成 Data URL）
+_IMAGE_MIME_BY_EXT = {codec.ext: codec.mime for codec in IMAGE_CODECS.values()} | {"jpeg": "image/jpeg", "png": "image/png"}
+
+
+@lru_cache(maxsize=16)
+def _load_manifest(path: Path, mtime_ns: int) -> dict:
+    """读取并解析投影片清单；以修改时间为缓存键，投影片重新生成后自动失效。"""
+    return json.loads(path.read_text(encoding="utf-8"))
@@ -1,15 +1,34 @@
 """语音转录服务：使用本地 Whisper 模型将视频音频转录为字幕片段。"""
 
 import asyncio
+import multiprocessing
+import os
 import re
 import subprocess
-import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Callable
+from typing import AsyncIterator, Iterator, Optional, Callable
 
+import numpy as np
 from loguru import logger
 
+from app.config import settings
 from app.services.subtitle import SubtitleSegment
+from app.services.vad import SpeechTimeline, VoiceActivityDetector
+
+# Whisper 输入采样率
+SAMPLE_RATE = 16000
+
+# 未开启分块并行时，音频在静音处切成约该秒数的窗口依次转录，每个窗口完成即产出其片段
+_STREAM_WINDOW_SECONDS = 300
+
+# 读取音频时 FFmpeg 连续无输出超过该秒数，或整体耗时超过上限，即终止 FFmpeg
+_AUDIO_STALL_SECONDS = 60
+_AUDIO_DEADLINE_SECONDS = 1800
 
 # no_speech_prob 超过此值的片段视为无语音，直接跳过
 _NO_SPEECH_THRESHOLD = 0.6
@@ -30,6 +49,176 @@ _HALLUCINATION_RES = [
 ]
 
 
+class _ModelEntry:
+    """注册表中的一个模型：推理锁（Whisper 解码会在模型上挂 KV 缓存钩子，同一模型不可并发推理）与占用计数。"""
+
+    def __init__(self, model, nbytes: int):
+        self.model = model
+        self.nbytes = nbytes
+        self.lock = threading.Lock()
+        self.users = 0
+
+
+class WhisperModelRegistry:
+    """
+    进程内 Whisper 模型注册表：每个模型只加载一次，所有任务共用。
+
+    同一模型的推理串行执行（不同模型可并行）；加载新模型或释放占用后按最近使用顺序淘汰
+    未被占用的模型，使模型参数总大小不超过上限。线程安全。
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        初始化注册表。
+
+        参数：
+            max_bytes: 常驻模型参数总大小上限（字节，0 表示不限）
+        """
+        self.max_bytes = max_bytes
+        self._models: OrderedDict[str, _ModelEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: dict[str, threading.Lock] = {}
+
+    @contextmanager
+    def use(self, name: str) -> Iterator:
+        """
+        占用模型进行推理（必要时先加载），期间独占该模型、不会被淘汰。
+
+        参数：
+            name: Whisper 模型名称
+
+        返回：
+            上下文管理器，产出 Whisper 模型对象
+        """
+        entry = self._acquire(name)
+        try:
+            with entry.lock:
+                yield entry.model
+        finally:
+            with self._lock:
+                entry.users -= 1
+                # 加载时因仍被占用而未能淘汰的模型，在释放后补做淘汰
+                self._evict()
+
+    def preload(self, name: str) -> None:
+        """预先加载模型（启动预热用，同步；失败只记录日志，首次转录时会再次尝试）。"""
+        try:
+            entry = self._acquire(name)
+        except Exception as e:
+            logger.warning(f"预加载 Whisper 模型失败: {e}")
+            return
+        with self._lock:
+            entry.users -= 1
+            self._evict()
+
+    def _acquire(self, name: str) -> _ModelEntry:
+        """返回已加载的模型并增加占用计数；未加载时加载（同名模型只加载一次）。"""
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None:
+                self._models.move_to_end(name)
+                entry.users += 1
+                return entry
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(name)
+                if entry is not None:
+                    self._models.move_to_end(name)
+                    entry.users += 1
+                    return entry
+            model = self._load(name)
+            nbytes = sum(p.numel() * p.element_size() for p in model.parameters())
+            with self._lock:
+                entry = self._models[name] = _ModelEntry(model, nbytes)
+                entry.users += 1
+                self._evict()
+            return entry
+
+    def _evict(self) -> None:
+        """按最近使用顺序淘汰未被占用的模型，直到总大小不超过上限（调用方持有 self._lock）。"""
+        if not self.max_bytes:
+            return
+        total = sum(entry.nbytes for entry in self._models.values())
+        for name in list(self._models):
+            if total <= self.max_bytes:
+                break
+            entry = self._models[name]
+            if entry.users:
+                continue
+            del self._models[name]
+            total -= entry.nbytes
+            logger.info(f"淘汰 Whisper 模型: {name}（释放 {entry.nbytes / 1024 / 1024:.0f} MB）")
+
+    @staticmethod
+    def _load(name: str):
+        """加载 Whisper 模型（首次调用时自动下载到 ~/.cache/whisper/）。"""
+        import whisper
+
+        logger.info(f"加载 Whisper 模型: {name}（首次运行将自动下载模型文件）")
+        model = whisper.load_model(name)
+        logger.info(f"Whisper 模型加载完成: {name}")
+        return model
+
+
+# 进程内共享的 Whisper 模型注册表（分块转录的工作进程各有一份）
+whisper_models = WhisperModelRegistry(settings.whisper_cache_mb * 1024 * 1024)
+
+# 分块转录共用的进程池
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _whisper_pool() -> ProcessPoolExecutor:
+    """返回（必要时创建）分块转录共用的进程池；每个工作进程的 torch 线程数按 CPU 核数均分。"""
+    global _pool
+    if _pool is None:
+        workers = max(1, settings.whisper_workers)
+        _pool = ProcessPoolExecutor(
+            max_workers=workers,
+            # spawn 启动：fork 会复制父进程的 torch/CUDA 状态，可能死锁
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_whisper_worker,
+            initargs=(max(1, (os.cpu_count() or 1) // workers),),
+        )
+    return _pool
+
+
+def shutdown_whisper_pool() -> None:
+    """关闭分块转录进程池（应用退出时调用）。"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _init_whisper_worker(threads: int) -> None:
+    """工作进程初始化：限制 torch 线程数，避免多个进程争抢 CPU。"""
+    import torch
+
+    torch.set_num_threads(threads)
+
+
+def _whisper_transcribe(model_name: str, audio: np.ndarray) -> dict:
+    """用注册表中的模型转录一段音频（同步），只保留后续处理需要的字段。"""
+    with whisper_models.use(model_name) as model:
+        result = model.transcribe(
+            audio,
+            verbose=False,
+            word_timestamps=False,
+            no_speech_threshold=_NO_SPEECH_THRESHOLD,  # 低置信度片段直接跳过
+            initial_prompt="",                          # 空提示词减少幻觉
+            condition_on_previous_text=False,           # 避免错误文本向后传播
+        )
+    return {
+        "language": result.get("language"),
+        "segments": [
+            {key: seg.get(key) for key in ("start", "end", "text", "no_speech_prob")}
+            for seg in result.get("segments", [])
+        ],
+    }
+
+
 class WhisperTranscriber:
     """使用 OpenAI Whisper 本地模型进行语音识别，输出 SubtitleSegment 列表。"""
 
@@ -43,103 +232,298 @@ class WhisperTranscriber:
         """
         self.model_name = model_name
         self.ffmpeg_path = ffmpeg_path
-        self._model = None  # 延迟加载，首次转录时才下载模型
-
-    def _load_model(self):
-        """延迟加载 Whisper 模型（首次调用时自动下载到 ~/.cache/whisper/）。"""
-        if self._model is None:
-            import whisper
-            logger.info(f"加载 Whisper 模型: {self.model_name}（首次运行将自动下载模型文件）")
-            self._model = whisper.load_model(self.model_name)
-            logger.info(f"Whisper 模型加载完成: {self.model_name}")
-        return self._model
 
     async def transcribe(
         self,
         video_path: Path,
         progress_callback: Optional[Callable[[int], None]] = None,
+        duration: float = 0.0,
     ) -> list[SubtitleSegment]:
         """
-        转录视频语音，返回带时间戳的字幕片段列表。
+        转录视频语音，返回带时间戳的字幕片段列表（等待全部转录完成）。
 
         参数：
             video_path: 视频文件路径
             progress_callback: 进度回调，接受 0-100 整数
+            duration: 影片时长（秒），用于预分配音频缓冲区与计算读取进度（0 表示未知）
 
         返回：
             SubtitleSegment 列表，按时间顺序排列
         """
+        return [seg async for seg in self.iter_segments(video_path, progress_callback, duration)]
+
+    async def iter_segments(
+        self,
+        video_path: Path,
+        progress_callback: Optional[Callable[[int], None]] = None,
+        duration: float = 0.0,
+    ) -> AsyncIterator[SubtitleSegment]:
+        """
+        转录视频语音，按时间顺序逐段产出字幕片段。
+
+        音频由一个 FFmpeg 进程解码为 16kHz 单声道 PCM，经管道直接读入内存交给 Whisper，不写临时文件。
+        开启语音活动检测时只转录语音区间（拼接后转录，时间戳换算回原始时间）。
+        音频在静音处切成数分钟的窗口（分块并行时并行转录，否则依次转录），前面的窗口全部完成即产出其片段，
+        调用方可在后续窗口转录期间处理已产出的内容。提前停止迭代会取消尚未开始的窗口。
+
+        参数：
+            video_path: 视频文件路径
+            progress_callback: 进度回调，接受 0-100 整数
+            duration: 影片时长（秒），用于预分配音频缓冲区与计算读取进度（0 表示未知）
+
+        产出：
+            SubtitleSegment，按时间顺序
+        """
         loop = asyncio.get_event_loop()
 
         if progress_callback:
             progress_callback(5)
 
-        # 提取音频到临时 WAV 文件
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-            audio_path = Path(tmp.name)
+        def audio_progress(seconds: float) -> None:
+            if progress_callback and duration > 0:
+                progress_callback(5 + int(min(seconds / duration, 1.0) * 15))
 
-        try:
-            await self._extract_audio(video_path, audio_path)
-            if progress_callback:
-                progress_callback(20)
+        audio = await loop.run_in_executor(None, self._read_audio, video_path, duration, audio_progress)
+        timeline = None
+        if settings.whisper_vad:
+            timeline = await loop.run_in_executor(None, self._speech_timeline, audio)
+            if timeline:
+                audio = await loop.run_in_executor(None, timeline.compact, audio)
+        if progress_callback:
+            progress_callback(20)
+
+        def restore(seg: SubtitleSegment) -> SubtitleSegment:
+            if timeline:
+                seg.start = timeline.to_original(seg.start)
+                seg.end = timeline.to_original(seg.end, is_end=True)
+            return seg
+
+        parallel = settings.whisper_chunk_seconds > 0
+        window = (settings.whisper_chunk_seconds if parallel else _STREAM_WINDOW_SECONDS) * SAMPLE_RATE
+        count = 0
+        async for seg in self._transcribe_windows(audio, window, parallel, progress_callback):
+            count += 1
+            yield restore(seg)
+        logger.info(f"Whisper 转录完成: {count} 个片段")
 
-            # Whisper 是 CPU 密集型，在线程池中运行
-            result = await loop.run_in_executor(
-                None, self._run_whisper, audio_path
-            )
+        if progress_callback:
+            progress_callback(95)
 
-            if progress_callback:
-                progress_callback(95)
+    async def _transcribe_windows(
+        self,
+        audio: np.ndarray,
+        window_samples: int,
+        parallel: bool,
+        progress_callback: Optional[Callable[[int], None]] = None,
+    ) -> AsyncIterator[SubtitleSegment]:
+        """
+        分窗口转录：在静音处把音频切成数分钟的窗口，按窗口偏移校正时间戳后按序产出。
+
+        parallel 为真时全部窗口交给进程池并行转录；否则在本进程的线程池中逐个窗口转录
+        （与整段转录的 CPU 开销相当，但第一个窗口完成后即可产出）。
+
+        参数：
+            audio: 16kHz 单声道 float32 音频
+            window_samples: 每个窗口的目标采样数
+            parallel: 是否用进程池并行转录
+            progress_callback: 进度回调，每完成一个窗口上报一次（20-95）
 
-            segments = self._to_segments(result)
-            logger.info(f"Whisper 转录完成: {len(segments)} 个片段，语言={result.get('language', '?')}")
-            return segments
+        产出：
+            SubtitleSegment，按时间顺序（第 k 个窗口在前 k-1 个都完成后产出）
+        """
+        loop = asyncio.get_event_loop()
+        bounds = self._split_at_silence(audio, window_samples)
+        executor = _whisper_pool() if parallel else None
+        done = 0
+
+        async def _run(start: int, end: int) -> list[SubtitleSegment]:
+            # Whisper 是 CPU 密集型，在线程池或进程池中运行
+            nonlocal done
+            result = await loop.run_in_executor(executor, _whisper_transcribe, self.model_name, audio[start:end])
+            done += 1
+            if done == 1:
+                logger.info(f"Whisper 识别语言: {result.get('language', '?')}")
+            if progress_callback:
+                progress_callback(20 + int(done / len(bounds) * 75))
+            return self._to_segments(result, offset=start / SAMPLE_RATE)
 
+        logger.info(f"Whisper 转录: {len(bounds)} 个窗口（{'并行' if parallel else '依次'}）")
+        tasks = [asyncio.ensure_future(_run(start, end)) for start, end in bounds] if parallel else []
+        try:
+            for i, (start, end) in enumerate(bounds):
+                if not parallel:
+                    tasks.append(asyncio.ensure_future(_run(start, end)))
+                for seg in await tasks[i]:
+                    yield seg
         finally:
-            audio_path.unlink(missing_ok=True)
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def _speech_timeline(audio: np.ndarray) -> Optional[SpeechTimeline]:
+        """
+        检测语音区间（同步，在线程池中调用）。
+
+        返回：
+            语音区间的时间映射；未检测到语音（可能是整体音量过低）或几乎全是语音时返回 None，转录整段音频
+        """
+        regions = VoiceActivityDetector(SAMPLE_RATE).detect(audio)
+        if not regions:
+            logger.warning("语音活动检测未找到语音，转录整段音频")
+            return None
+        timeline = SpeechTimeline(regions, SAMPLE_RATE)
+        ratio = timeline.speech_samples / max(len(audio), 1)
+        if ratio > 0.95:
+            return None
+        skipped = (len(audio) - timeline.speech_samples) / SAMPLE_RATE
+        logger.info(f"语音活动检测: {len(regions)} 个语音区间，语音占 {ratio:.0%}，跳过 {skipped:.0f}s 非语音")
+        return timeline
+
+    @staticmethod
+    def _split_at_silence(audio: np.ndarray, chunk_samples: int, search_seconds: float = 15.0) -> list[tuple[int, int]]:
+        """
+        将音频切成约 chunk_samples 长的块，切点取目标位置前后 search_seconds 内能量最低的 100ms 帧中点。
+
+        参数：
+            audio: 16kHz 单声道 float32 音频
+            chunk_samples: 每块的目标采样数
+            search_seconds: 切点搜索范围（秒）
+
+        返回：
+            [(起始采样, 结束采样), ...]，首尾相接覆盖整段音频
+        """
+        frame = SAMPLE_RATE // 10
+        n_frames = len(audio) // frame
+        frames = audio[: n_frames * frame].reshape(n_frames, frame)
+        energy = np.einsum("ij,ij->i", frames, frames)   # 逐帧平方和，不生成整段平方数组
+        search = int(search_seconds * SAMPLE_RATE) // frame
+        chunk_frames = chunk_samples // frame
+
+        cuts = [0]
+        pos = 0
+        # 剩余不足 1.5 块时不再切分，避免末尾出现过短的块
+        while n_frames - pos > chunk_frames * 1.5:
+            target = pos + chunk_frames
+            lo = max(pos + chunk_frames // 2, target - search)
+            hi = min(target + search, n_frames)
+            pos = lo + int(np.argmin(energy[lo:hi]))
+            cuts.append(pos * frame + frame // 2)
+        cuts.append(len(audio))
+        return list(zip(cuts, cuts[1:]))
+
+    def iter_audio(self, video_path: Path, chunk_seconds: float = 30.0) -> Iterator[np.ndarray]:
+        """
+        逐块读取影片音频（同步生成器）：FFmpeg 输出 16kHz 单声道 s16le PCM 到管道，每块转为 float32。
+
+        看门狗线程在 FFmpeg 卡住（读取等待超过 _AUDIO_STALL_SECONDS）或整体超过 _AUDIO_DEADLINE_SECONDS 时
+        终止 FFmpeg，生成器随之抛出 RuntimeError，不会无限占用转录线程。
+
+        参数：
+            video_path: 视频文件路径
+            chunk_seconds: 每块时长（秒），最后一块可能更短
 
-    async def _extract_audio(self, video_path: Path, audio_path: Path) -> None:
-        """使用 FFmpeg 提取 16kHz 单声道 WAV 音频（Whisper 推荐输入格式）。"""
+        返回：
+            float32 数组（取值 -1~1）的迭代器
+        """
         cmd = [
             self.ffmpeg_path,
+            "-nostdin",
+            "-hide_banner",
+            "-nostats",
+            "-loglevel", "error",           # stderr 只保留错误，便于失败时回报
             "-i", str(video_path),
-            "-vn",             # 只处理音频
+            "-vn", "-sn",                   # 只处理音频
+            "-f", "s16le",
             "-acodec", "pcm_s16le",
-            "-ar", "16000",    # 16kHz 采样率
-            "-ac", "1",        # 单声道
-            "-y",
-            str(audio_path),
+            "-ar", str(SAMPLE_RATE),        # 16kHz 采样率
+            "-ac", "1",                     # 单声道
+            "pipe:1",
         ]
+        chunk_bytes = int(chunk_seconds * SAMPLE_RATE) * 2
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        # stderr 由独立线程读取，避免管道写满阻塞 FFmpeg
+        tail: list[bytes] = []
+        reader = threading.Thread(target=lambda: tail.extend(proc.stderr.readlines()[-20:]), daemon=True)
+        reader.start()
+
+        # 看门狗：只计读取阻塞的时间（消费方处理数据的时间不算卡住）
+        started = time.monotonic()
+        waiting_since: Optional[float] = None
+        finished = threading.Event()
+        timed_out: list[str] = []
+
+        def watchdog() -> None:
+            while not finished.wait(1):
+                now = time.monotonic()
+                if waiting_since is not None and now - waiting_since > _AUDIO_STALL_SECONDS:
+                    timed_out.append(f"FFmpeg 超过 {_AUDIO_STALL_SECONDS} 秒无输出")
+                elif now - started > _AUDIO_DEADLINE_SECONDS:
+                    timed_out.append(f"音频提取超过 {_AUDIO_DEADLINE_SECONDS} 秒")
+                else:
+                    continue
+                proc.kill()
+                return
+
+        threading.Thread(target=watchdog, daemon=True).start()
+        try:
+            while True:
+                waiting_since = time.monotonic()
+                data = proc.stdout.read(chunk_bytes)
+                waiting_since = None
+                if not data:
+                    break
+                data = data[: len(data) // 2 * 2]
+                yield np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+        finally:
+            finished.set()
+            proc.stdout.close()
+            if proc.poll() is None:
+                proc.kill()
+            returncode = proc.wait()
+            reader.join(timeout=5)
+        if timed_out:
+            raise RuntimeError(f"FFmpeg 音频提取已终止: {timed_out[0]}")
+        if returncode != 0:
+            stderr = b"".join(tail).decode("utf-8", errors="replace")
+            raise RuntimeError(f"FFmpeg 音频提取失败: {stderr[-500:]}")
+
+    def _read_audio(
+        self,
+        video_path: Path,
+        duration: float = 0.0,
+        progress_callback: Optional[Callable[[float], None]] = None,
+    ) -> np.ndarray:
+        """
+        读取整段音频为 float32 数组（同步）。
 
-        def _run():
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-            if result.returncode != 0:
-                raise RuntimeError(f"FFmpeg 音频提取失败: {result.stderr[-500:]}")
+        已知时长时按时长预分配缓冲区，逐块填入，不额外保留整段 int16 数据；超出时按块扩容。
 
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, _run)
-
-    def _run_whisper(self, audio_path: Path) -> dict:
-        """在线程池中同步执行 Whisper 转录。"""
-        import os
-        model = self._load_model()
-        # Whisper 内部调用 ffmpeg 读取音频，需确保 ffmpeg 在 PATH 中
-        ffmpeg_dir = str(Path(self.ffmpeg_path).parent)
-        env_path = os.environ.get("PATH", "")
-        if ffmpeg_dir not in env_path:
-            os.environ["PATH"] = ffmpeg_dir + os.pathsep + env_path
-        return model.transcribe(
-            str(audio_path),
-            verbose=False,
-            word_timestamps=False,
-            no_speech_threshold=_NO_SPEECH_THRESHOLD,  # 低置信度片段直接跳过
-            initial_prompt="",                          # 空提示词减少幻觉
-            condition_on_previous_text=False,           # 避免错误文本向后传播
-        )
+        参数：
+            video_path: 视频文件路径
+            duration: 影片时长（秒），0 表示未知
+            progress_callback: 读取进度回调，参数为已读取的秒数
+
+        返回：
+            16kHz 单声道 float32 音频
+        """
+        buffer = np.empty(int(duration * SAMPLE_RATE) + SAMPLE_RATE, dtype=np.float32)
+        filled = 0
+        for chunk in self.iter_audio(video_path):
+            if filled + len(chunk) > len(buffer):
+                grown = np.empty(max(len(buffer) * 2, filled + len(chunk)), dtype=np.float32)
+                grown[:filled] = buffer[:filled]
+                buffer = grown
+            buffer[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
+            if progress_callback:
+                progress_callback(filled / SAMPLE_RATE)
+        logger.info(f"音频读取完成: {filled / SAMPLE_RATE:.0f}s")
+        return buffer[:filled]
 
     @staticmethod
-    def _to_segments(result: dict) -> list[SubtitleSegment]:
-        """将 Whisper 输出的 segments 转换为 SubtitleSegment 列表，过滤幻觉片段。"""
+    def _to_segments(result: dict, offset: float = 0.0) -> list[SubtitleSegment]:
+        """将 Whisper 输出的 segments 转换为 SubtitleSegment 列表（时间加上 offset 秒），过滤幻觉片段。"""
         # 若检测语言为中文，自动将繁体转为简体
         converter = None
         if result.get("language") in ("zh", "chinese"):
@@ -176,8 +560,8 @@ class WhisperTranscriber:
                 text = converter.convert(text)
 
             segments.append(SubtitleSegment(
-                start=float(seg["start"]),
-                end=float(seg["end"]),
+                start=float(seg["start"]) + offset,
+                end=float(seg["end"]) + offset,
                 text=text,
             ))
 
@@ -0,0 +1,148 @@
+"""语音活动检测：以帧能量与过零率（带迟滞）找出语音区间，只把语音部分交给 Whisper 转录。"""
+
+import numpy as np
+
+
+class VoiceActivityDetector:
+    """
+    基于能量与过零率的语音活动检测器（纯 NumPy 向量化，不依赖额外模型）。
+
+    以 FRAME_MS 为帧长计算对数能量与过零率；噪声底取能量的 NOISE_PERCENTILE 分位数。
+    能量高于噪声底 ENTER_DB 且过零率低于 MAX_ZCR 的帧进入语音状态，
+    能量跌破噪声底 EXIT_DB 才退出（迟滞，避免在词间停顿处反复切换）。
+    短于 MIN_SILENCE_MS 的停顿并入语音，短于 MIN_SPEECH_MS 的语音丢弃，区间两侧各留 PAD_MS 余量。
+    """
+
+    FRAME_MS = 30
+    NOISE_PERCENTILE = 10
+    ENTER_DB = 12.0
+    EXIT_DB = 6.0
+    MAX_ZCR = 0.35
+    MIN_SPEECH_MS = 250
+    MIN_SILENCE_MS = 800
+    PAD_MS = 200
+
+    # 逐块计算过零率的帧数（限制临时布尔数组的内存占用）
+    BLOCK_FRAMES = 20000
+
+    def __init__(self, sample_rate: int = 16000):
+        """
+        初始化检测器。
+
+        参数：
+            sample_rate: 音频采样率
+        """
+        self.sample_rate = sample_rate
+
+    def detect(self, audio: np.ndarray) -> list[tuple[int, int]]:
+        """
+        检测语音区间。
+
+        参数：
+            audio: 单声道 float32 音频
+
+        返回：
+            [(起始采样, 结束采样), ...]，升序且互不重叠；音频过短时为空列表
+        """
+        frame = self.sample_rate * self.FRAME_MS // 1000
+        n_frames = len(audio) // frame
+        if n_frames == 0:
+            return []
+        frames = audio[: n_frames * frame].reshape(n_frames, frame)
+
+        energy = 10 * np.log10(np.einsum("ij,ij->i", frames, frames) / frame + 1e-10)
+        zcr = np.empty(n_frames, dtype=np.float32)
+        for start in range(0, n_frames, self.BLOCK_FRAMES):
+            signs = np.signbit(frames[start:start + self.BLOCK_FRAMES])
+            zcr[start:start + self.BLOCK_FRAMES] = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame
+
+        floor = np.percentile(energy, self.NOISE_PERCENTILE)
+        enter = (energy > floor + self.ENTER_DB) & (zcr < self.MAX_ZCR)
+        leave = energy < floor + self.EXIT_DB
+        speech = self._hysteresis(enter, leave)
+
+        # 状态切换点 → 区间（帧序号）
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], speech.view(np.int8), [0]))))
+        starts, ends = edges[0::2], edges[1::2]
+        if len(starts) == 0:
+            return []
+
+        # 合并短停顿，再丢弃过短的语音
+        min_silence = self.MIN_SILENCE_MS // self.FRAME_MS
+        keep = np.concatenate(([True], starts[1:] - ends[:-1] >= min_silence))
+        starts = starts[keep]
+        ends = np.maximum.reduceat(ends, np.flatnonzero(keep))
+        long_enough = ends - starts >= self.MIN_SPEECH_MS // self.FRAME_MS
+        starts, ends = starts[long_enough], ends[long_enough]
+
+        # 两侧留余量（采样单位），余量重叠的区间合并
+        pad = self.sample_rate * self.PAD_MS // 1000
+        regions: list[tuple[int, int]] = []
+        for s, e in zip(starts * frame - pad, ends * frame + pad):
+            s, e = max(int(s), 0), min(int(e), len(audio))
+            if regions and s <= regions[-1][1]:
+                regions[-1] = (regions[-1][0], e)
+            else:
+                regions.append((s, e))
+        return regions
+
+    @staticmethod
+    def _hysteresis(enter: np.ndarray, leave: np.ndarray) -> np.ndarray:
+        """
+        迟滞状态机的向量化实现：enter 帧置为语音，leave 帧置为非语音，其余帧沿用前一帧状态。
+
+        参数：
+            enter: 进入语音的帧（布尔数组）
+            leave: 退出语音的帧（布尔数组）
+
+        返回：
+            每帧是否为语音（布尔数组）
+        """
+        # 每帧的"最近一次决定"：1 进入、0 退出、-1 无决定
+        decision = np.where(enter, 1, np.where(leave, 0, -1))
+        last = np.where(decision >= 0, np.arange(len(decision)), -1)
+        np.maximum.accumulate(last, out=last)
+        return np.where(last >= 0, decision[np.maximum(last, 0)], 0).astype(bool)
+
+
+class SpeechTimeline:
+    """语音区间拼接后的时间映射：把拼接音频上的时间换算回原始音频的时间。"""
+
+    def __init__(self, regions: list[tuple[int, int]], sample_rate: int = 16000):
+        """
+        初始化时间映射。
+
+        参数：
+            regions: 语音区间 [(起始采样, 结束采样), ...]，升序且互不重叠
+            sample_rate: 音频采样率
+        """
+        self.regions = regions
+        self.sample_rate = sample_rate
+        self._orig_starts = np.array([s for s, _ in regions], dtype=np.int64)
+        lengths = np.array([e - s for s, e in regions], dtype=np.int64)
+        self._compact_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    @property
+    def speech_samples(self) -> int:
+        """语音区间的总采样数。"""
+        return sum(e - s for s, e in self.regions)
+
+    def compact(self, audio: np.ndarray) -> np.ndarray:
+        """返回只含语音区间的拼接音频。"""
+        return np.concatenate([audio[s:e] for s, e in self.regions])
+
+    def to_original(self, seconds: float, is_end: bool = False) -> float:
+        """
+        将拼接音频上的时间换算为原始音频的时间。
+
+        参数：
+            seconds: 拼接音频上的时间（秒）
+            is_end: 是否为片段结束时间（恰好落在区间交界时归入前一区间的末尾，而非后一区间的开头）
+
+        返回：
+            原始音频上的时间（秒）
+        """
+        pos = seconds * self.sample_rate
+        idx = int(np.searchsorted(self._compact_starts, pos, side="left" if is_end else "right")) - 1
+        idx = max(idx, 0)
+        return float(self._orig_starts[idx] + pos - self._compact_starts[idx]) / self.sample_rate